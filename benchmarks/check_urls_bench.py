@@ -0,0 +1,81 @@
+"""Probing many Ingress hosts with check_urls.probe_all.
+
+Starts a local keep-alive HTTP server that answers any Host header after
+--delay seconds (the ingress stand-in), then probes --hosts hosts one by one
+on a fresh connection each (what the old curl loop did, minus the process
+spawn) and with the pooled, concurrent prober.
+
+Usage: python benchmarks/check_urls_bench.py [--hosts 150] [--delay 0.02] [--concurrency 16]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "python"))
+
+from check_urls import Prober, probe_all  # noqa: E402
+
+
+def make_handler(delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(delay)
+            if self.path == "/" and self.headers["Host"].startswith("redirect"):
+                self.send_response(302)
+                self.send_header("Location", "/login")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = b"ok"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=150)
+    parser.add_argument("--delay", type=float, default=0.02, help="server think time per request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.delay))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    hosts = [f"app{i}.kube-lab.local" for i in range(args.hosts - 1)] + ["redirect.kube-lab.local"]
+
+    start = time.perf_counter()
+    for host in hosts:
+        Prober("127.0.0.1", port=port).probe(host)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = probe_all(hosts, "127.0.0.1", concurrency=args.concurrency, port=port)
+    pooled = time.perf_counter() - start
+    server.shutdown()
+
+    failed = [r for r in results if not r["ok"]]
+    connects = sum(r["connect_ms"] > 0 for r in results)
+    ttfb = sorted(r["ttfb_ms"] for r in results)
+    print(f"hosts:                     {len(hosts)} ({len(failed)} failed)")
+    print(f"sequential, new conn each: {sequential:6.2f}s")
+    print(f"pooled, {args.concurrency:3d} at a time:    {pooled:6.2f}s  ({sequential / pooled:.1f}x)")
+    print(f"connections opened:        {connects}")
+    print(f"ttfb p50 / p99:            {ttfb[len(ttfb) // 2]:.1f} / {ttfb[int(len(ttfb) * .99)]:.1f} ms")
+    print(f"redirect host:             {results[-1]['status']} after {results[-1]['redirects']} redirect(s)")
+
+
+if __name__ == "__main__":
+    main()
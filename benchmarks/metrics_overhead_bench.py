@@ -0,0 +1,69 @@
+"""Per-request cost of common.middleware.MetricsMiddleware.
+
+Calls a trivial WSGI app directly, with and without the middleware, the way a
+server would (iterate the body, then close it), and prints the difference.
+By default it runs once single-process and once with PROMETHEUS_MULTIPROC_DIR
+set, as under gunicorn, each in a fresh interpreter: prometheus_client picks
+its value backend at import time.
+
+Usage: python benchmarks/metrics_overhead_bench.py [--requests 200000] [--mode both]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "python", "apps"))
+
+BODY = [b"hello"]
+HEADERS = [("Content-Type", "text/plain"), ("Content-Length", "5")]
+
+
+def hello(environ, start_response):
+    start_response("200 OK", HEADERS)
+    return BODY
+
+
+def start_response(status, headers, exc_info=None):
+    return None
+
+
+def serve(app, requests, route_key):
+    environ = {"REQUEST_METHOD": "GET", route_key: "/"}
+    start = time.perf_counter()
+    for _ in range(requests):
+        body = app(environ, start_response)
+        for _ in body:
+            pass
+        if hasattr(body, "close"):
+            body.close()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--mode", choices=("single", "multiprocess", "both"), default="both")
+    args = parser.parse_args()
+
+    if args.mode == "both":
+        for mode in ("single", "multiprocess"):
+            subprocess.run([sys.executable, __file__, "--requests", str(args.requests), "--mode", mode], check=True)
+        return
+
+    if args.mode == "multiprocess":
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="metrics-bench-")
+    from common.middleware import ROUTE_KEY, MetricsMiddleware
+
+    bare = serve(hello, args.requests, ROUTE_KEY)
+    metered = serve(MetricsMiddleware(hello), args.requests, ROUTE_KEY)
+    print(f"[{args.mode}]")
+    print(f"bare app:        {bare:6.2f} us/request")
+    print(f"with middleware: {metered:6.2f} us/request")
+    print(f"overhead:        {metered - bare:6.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
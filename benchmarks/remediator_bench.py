@@ -0,0 +1,63 @@
+"""Time-to-remediate for N simultaneous failures: serial loop vs RemediationEngine.
+
+Runs the real remediate() against a fake AppsV1Api that takes --latency seconds
+per patch. The remediation policy is replaced by a permissive one (no cooldown,
+no rate limit) so every job is actually patched.
+
+Usage: python benchmarks/remediator_bench.py [--failures 1,10,50] [--latency 0.2] [--workers 8]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+APPS = os.path.join(os.path.dirname(__file__), "..", "python", "apps")
+sys.path[:0] = [os.path.join(APPS, "remediator"), APPS]
+
+import remediator  # noqa: E402
+from engine import RemediationEngine  # noqa: E402
+from fakes import FakeAppsV1Api  # noqa: E402
+from policy import RemediationPolicy  # noqa: E402
+from targets import Workload  # noqa: E402
+
+
+def serial(jobs):
+    remediator.policy = RemediationPolicy(cooldown=0, rate=None)
+    start = time.perf_counter()
+    for job in jobs:
+        remediator.remediate(job)
+    return time.perf_counter() - start
+
+
+def concurrent(jobs, workers):
+    remediator.policy = RemediationPolicy(cooldown=0, rate=None)
+    engine = RemediationEngine(remediator.remediate, max_workers=workers)
+    start = time.perf_counter()
+    wait([engine.submit(job) for job in jobs])
+    elapsed = time.perf_counter() - start
+    engine.shutdown()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--failures", default="1,10,50")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    remediator.apps_v1 = FakeAppsV1Api(latency=args.latency)
+    print(f"{'failures':>9} {'serial s':>10} {'engine s':>10} {'speedup':>8}")
+    for n in (int(f) for f in args.failures.split(",")):
+        jobs = [Workload("Deployment", "default", f"app-{i}") for i in range(n)]
+        with contextlib.redirect_stdout(io.StringIO()):  # remediate() logs every restart
+            s = serial(jobs)
+            c = concurrent(jobs, args.workers)
+        print(f"{n:>9} {s:>10.2f} {c:>10.2f} {s / c:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Counter lookup vs COUNT(*) scans as `tasks` grows, plus a drift check.
+
+Runs a random add/complete/delete workload and verifies after every step that
+the trigger-maintained counters match a full recount. Exits non-zero on drift.
+
+Usage: python benchmarks/todo_counters_bench.py [--ops 5000] [--sizes 1000,10000,100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "python", "apps", "todo-app"))
+
+import db  # noqa: E402
+
+
+def check_drift(ops):
+    rng = random.Random(42)
+    ids = []
+    for step in range(ops):
+        roll = rng.random()
+        if roll < 0.5 or not ids:
+            with db.pool.connection() as conn, conn:
+                ids.append(conn.execute(db.SQL_INSERT, (f"task {step}",)).lastrowid)
+        elif roll < 0.8:
+            db.complete_task(rng.choice(ids))
+        else:
+            db.delete_task(ids.pop(rng.randrange(len(ids))))
+
+        if db.count_tasks() != db.scan_counts():
+            print(f"❌ Drift after {step + 1} ops: counters={db.count_tasks()} scan={db.scan_counts()}")
+            return False
+    print(f"✅ No drift across {ops} random operations ({db.count_tasks()})")
+    return True
+
+
+def time_per_call(fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def compare(sizes):
+    print(f"{'rows':>10} {'counters (us)':>15} {'COUNT(*) (us)':>15}")
+    for size in sizes:
+        with db.pool.connection() as conn, conn:
+            have = conn.execute(db.SQL_COUNT_ALL).fetchone()[0]
+            conn.executemany(db.SQL_INSERT, ((f"bulk {i}",) for i in range(size - have)))
+        print(f"{size:>10} {time_per_call(db.count_tasks):>15.1f} {time_per_call(db.scan_counts, 20):>15.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.pool = db.ConnectionPool(os.path.join(tmp, "todo.db"))
+        db.init_db()
+        ok = check_drift(args.ops)
+        compare(sorted(int(s) for s in args.sizes.split(",")))
+        db.pool.close_all()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
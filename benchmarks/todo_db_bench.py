@@ -0,0 +1,78 @@
+"""Requests/sec of the todo-app routes: connect-per-request vs the pooled WAL data layer.
+
+Usage: python benchmarks/todo_db_bench.py [--threads 8] [--seconds 5] [--seed 200]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+APPS = os.path.join(os.path.dirname(__file__), "..", "python", "apps")
+sys.path[:0] = [os.path.join(APPS, "todo-app"), APPS]
+
+import db  # noqa: E402
+from app import app  # noqa: E402
+
+
+class LegacyPool(db.ConnectionPool):
+    """The old behaviour: a fresh rollback-journal connection for every query."""
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    def acquire(self):
+        return self.connect()
+
+    def release(self, conn):
+        conn.close()
+
+
+def run(pool, threads, seconds, seed):
+    db.pool = pool
+    db.init_db()
+    for i in range(seed):
+        db.add_task(f"seed task {i}")
+
+    counts = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(n):
+        client = app.test_client()
+        i = 0
+        while time.perf_counter() < stop:
+            if i % 5 == 0:
+                client.post("/add", data={"content": f"task {n}-{i}"})
+            else:
+                client.get("/?filter=active")
+            i += 1
+        counts[n] = i
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    pool.close_all()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = run(LegacyPool(os.path.join(tmp, "legacy.db")), args.threads, args.seconds, args.seed)
+        after = run(db.ConnectionPool(os.path.join(tmp, "pooled.db")), args.threads, args.seconds, args.seed)
+
+    print(f"connect-per-request: {before:8.1f} req/s")
+    print(f"pooled WAL:          {after:8.1f} req/s  ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
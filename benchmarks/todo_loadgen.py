@@ -0,0 +1,80 @@
+"""Closed-loop load generator for todo-app: WSGI vs ASGI throughput at rising concurrency.
+
+Start the two servers the way the image runs them (gunicorn with
+common/gunicorn_conf.py, multiprocess metrics), then point the script at both:
+
+    cd python/apps/todo-app
+    export PYTHONPATH=..
+    TODO_DB_PATH=/tmp/wsgi.db python -c 'import db; db.init_db()'
+    TODO_DB_PATH=/tmp/wsgi.db PROMETHEUS_MULTIPROC_DIR=/tmp/wsgi-metrics PORT=5000 \
+        gunicorn -c ../common/gunicorn_conf.py
+    TODO_DB_PATH=/tmp/asgi.db PROMETHEUS_MULTIPROC_DIR=/tmp/asgi-metrics PORT=5001 \
+        APP_MODULE=asgi:app GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn -c ../common/gunicorn_conf.py
+
+    python benchmarks/todo_loadgen.py wsgi=http://127.0.0.1:5000 asgi=http://127.0.0.1:5001
+
+Each client loops for --seconds: one POST /add for every --read-ratio page loads.
+Requires aiohttp (pip install aiohttp).
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+
+async def client(session, base_url, stop_at, read_ratio, stats):
+    i = 0
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        try:
+            if i % (read_ratio + 1) == 0:
+                resp = await session.post(f"{base_url}/add", data={"content": f"load {i}"}, allow_redirects=False)
+            else:
+                resp = await session.get(f"{base_url}/?filter=active&limit=20")
+            await resp.read()
+            stats["ok" if resp.status < 400 else "errors"] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            stats["errors"] += 1
+        stats["latencies"].append(time.perf_counter() - start)
+        i += 1
+
+
+async def run_level(base_url, concurrency, seconds, read_ratio):
+    stats = {"ok": 0, "errors": 0, "latencies": []}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        stop_at = time.perf_counter() + seconds
+        await asyncio.gather(*(client(session, base_url, stop_at, read_ratio, stats) for _ in range(concurrency)))
+
+    latencies = sorted(stats["latencies"]) or [0.0]
+    return {
+        "rps": stats["ok"] / seconds,
+        "errors": stats["errors"],
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("targets", nargs="+", help="name=url pairs, e.g. asgi=http://127.0.0.1:5001")
+    parser.add_argument("--concurrency", default="50,200,1000")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--read-ratio", type=int, default=4, help="page loads per write")
+    args = parser.parse_args()
+
+    targets = [t.split("=", 1) for t in args.targets]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    print(f"{'target':<8} {'clients':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for concurrency in levels:
+        for name, url in targets:
+            r = await run_level(url.rstrip("/"), concurrency, args.seconds, args.read_ratio)
+            print(f"{name:<8} {concurrency:>8} {r['rps']:>10.1f} {r['p50']:>9.1f} {r['p99']:>9.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
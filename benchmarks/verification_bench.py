@@ -0,0 +1,133 @@
+"""Wall time of a full post-provision verification run.
+
+Runs check_health, check_prometheus and check_urls in one process, the way
+provisioning does, against a stub `kubectl` that sleeps --fork-cost seconds
+per call (a real one spends ~0.2-0.5s on start-up and discovery) and local
+HTTP servers standing in for the ingress and Prometheus. The run is done with
+the shared kube_common cache (--ttl) and with caching disabled (ttl 0), and
+once more each with the old check_url() pattern of one ingress lookup per host.
+
+Usage: python benchmarks/verification_bench.py [--hosts 30] [--fork-cost 0.3] [--ttl 5]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "python"))
+
+import check_health  # noqa: E402
+import check_prometheus  # noqa: E402
+import check_urls  # noqa: E402
+import kube_common  # noqa: E402
+
+STUB = '''#!{python}
+import json, os, sys, time
+with open({calls!r}, "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+time.sleep({fork_cost})
+if "--watch-only" in sys.argv:
+    time.sleep(3600)
+elif "ingress" in sys.argv:
+    print(json.dumps({ingresses}))
+elif "json" in sys.argv:
+    print(json.dumps({pods}))
+'''
+
+
+def pod(name):
+    return {
+        "metadata": {"namespace": "default", "name": name, "creationTimestamp": "2025-01-01T00:00:00Z"},
+        "status": {
+            "phase": "Running",
+            "containerStatuses": [{"ready": True}],
+            "conditions": [{"type": "Ready", "status": "True", "lastTransitionTime": "2025-01-01T00:00:30Z"}],
+        },
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.startswith("/api/v1/query"):
+            result = [{"metric": {"job": job, "up": "1"}, "value": [0, "1"]} for job in check_prometheus.EXPECTED_JOBS]
+            body = json.dumps({"status": "success", "data": {"resultType": "vector", "result": result}}).encode()
+        else:
+            body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def verify(port, ttl, per_host):
+    kube_common._client = kube_common.KubeClient(ttl=ttl, use_api=False)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert check_health.check_all_pods_ready(timeout=30) == 0
+        assert check_prometheus.check_prometheus_targets(port=port) == 0
+        client = kube_common.get_client()
+        if per_host:
+            # The old check_url(): look the ingress address up again for every host
+            results = [check_urls.probe_all([host], client.ingress_ip(), port=port)[0] for host in client.ingress_hosts()]
+        else:
+            results = check_urls.probe_all(client.ingress_hosts(), client.ingress_ip(), port=port)
+        assert all(r["ok"] for r in results)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=30)
+    parser.add_argument("--fork-cost", type=float, default=0.3)
+    parser.add_argument("--ttl", type=float, default=5)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    workdir = tempfile.mkdtemp()
+    calls = os.path.join(workdir, "calls")
+    ingresses = {"metadata": {"resourceVersion": "1"}, "items": [{
+        "metadata": {"namespace": "default", "name": "lab"},
+        "spec": {"rules": [{"host": f"app{i}.kube-lab.local"} for i in range(args.hosts)]},
+        "status": {"loadBalancer": {"ingress": [{"ip": "127.0.0.1"}]}},
+    }]}
+    pods = {"metadata": {"resourceVersion": "1"}, "items": [pod(f"app{i}") for i in range(10)]}
+    kubectl = os.path.join(workdir, "kubectl")
+    with open(kubectl, "w") as f:
+        f.write(STUB.format(python=sys.executable, calls=calls, fork_cost=args.fork_cost,
+                            ingresses=ingresses, pods=pods))
+    os.chmod(kubectl, os.stat(kubectl).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = workdir + os.pathsep + os.environ["PATH"]
+
+    for label, ttl, per_host in (
+        ("per-host lookups, no cache", 0, True),
+        ("per-host lookups, cached", args.ttl, True),
+        ("no cache (ttl 0)", 0, False),
+        (f"shared cache (ttl {args.ttl:g})", args.ttl, False),
+    ):
+        open(calls, "w").close()
+        elapsed = verify(port, ttl, per_host)
+        with open(calls) as f:
+            forks = f.read().splitlines()
+        print(f"{label:<28} {elapsed:6.2f}s  kubectl calls: {len(forks)}  "
+              f"({sum('ingress' in c for c in forks)} ingress, {sum('pods' in c for c in forks)} pods)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
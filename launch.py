@@ -1,10 +1,12 @@
 import sys
 import subprocess
 import webbrowser
-import time
 import os
 import platform
 import json
+import codecs
+import shutil
+import tempfile
 from validate_env import validate_env
 
 
@@ -12,9 +14,11 @@ from validate_env import validate_env
 try:
     from PyQt5.QtWidgets import (
         QApplication, QWizard, QWizardPage, QLabel, QLineEdit, QVBoxLayout,
-        QTextEdit, QPushButton, QMessageBox, QHBoxLayout, QComboBox, QCheckBox, QSizePolicy
+        QPushButton, QMessageBox, QHBoxLayout, QComboBox, QCheckBox, QSizePolicy,
+        QPlainTextEdit, QWidget, QFileDialog
     )
-    from PyQt5.QtCore import Qt, QProcess, QTimer
+    from PyQt5.QtCore import Qt, QProcess, QTimer, QObject, pyqtSignal
+    from PyQt5.QtGui import QColor, QFont, QSyntaxHighlighter, QTextCharFormat
 except ImportError:
     print("📦 PyQt5 not found. Attempting to install it...")
     try:
@@ -409,7 +413,268 @@ class InstallOptionsPage(QWizardPage):
             return False
 
 
+class LogHighlighter(QSyntaxHighlighter):
+    """Colours a whole line by its first status marker; cheap enough for every line."""
+
+    RULES = (
+        (("[ERROR]", "❌"), "red"),
+        (("[WARN]", "⚠"), "orange"),
+        (("[OK]", "✅"), "green"),
+        (("[INFO]",), "cyan"),
+    )
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.formats = []
+        for markers, color in self.RULES:
+            fmt = QTextCharFormat()
+            fmt.setForeground(QColor(color))
+            self.formats.append((markers, fmt))
+
+    def highlightBlock(self, text):
+        for markers, fmt in self.formats:
+            if any(marker in text for marker in markers):
+                self.setFormat(0, len(text), fmt)
+                return
+
+
+class LogView(QWidget):
+    """Provisioning console: plain text, batched, with a bounded scrollback.
+
+    Lines are queued and written to the view at most every FLUSH_MS in one
+    insert. The view keeps the last MAX_LINES lines; the full log is spooled
+    to a temporary file and can be saved with the button.
+    """
+
+    FLUSH_MS = 100
+    MAX_LINES = 5000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.view = QPlainTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setMaximumBlockCount(self.MAX_LINES)
+        self.view.setUndoRedoEnabled(False)
+        self.view.setFont(QFont("Monospace"))
+        self.view.setStyleSheet("background-color: black; color: white;")
+        self.highlighter = LogHighlighter(self.view.document())
+
+        self.save_button = QPushButton("💾 Save Log...")
+        self.save_button.clicked.connect(self.save_log)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.view)
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self.save_button)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.pending = []
+        self.partial = ""
+        # Emoji are multi-byte; a read can end in the middle of one
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.spool = tempfile.TemporaryFile(mode="w+", encoding="utf-8", prefix="kube-lab-provision-")
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def append(self, text):
+        """Queue one message (it may span several lines)."""
+        self.pending.append(text)
+        self.spool.write(text + "\n")
+        if not self.flush_timer.isActive():
+            self.flush_timer.start(self.FLUSH_MS)
+
+    def append_output(self, data):
+        """Queue raw process output (bytes); a line split across reads is held until it completes."""
+        text = self.decoder.decode(data).replace("\r\n", "\n")
+        lines = (self.partial + text).split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            if line.strip():
+                self.append(line)
+
+    def end_output(self):
+        """The process is done: show whatever it printed without a final newline."""
+        if self.partial.strip():
+            self.append(self.partial)
+        self.partial = ""
+        self.decoder.reset()
+
+    def flush(self):
+        if not self.pending:
+            return
+        scrollbar = self.view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        self.view.appendPlainText("\n".join(self.pending))
+        self.pending = []
+        # Follow the output unless the user scrolled up to read something
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def clear(self):
+        self.pending = []
+        self.partial = ""
+        self.decoder.reset()
+        self.view.clear()
+        self.spool.seek(0)
+        self.spool.truncate()
+
+    def save_log(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Provisioning Log", "provision.log", "Log files (*.log *.txt)")
+        if not path:
+            return
+        self.flush()
+        self.spool.flush()
+        self.spool.seek(0)
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                shutil.copyfileobj(self.spool, f)
+        except OSError as e:
+            QMessageBox.warning(self, "Save Log", f"Could not save the log: {e}")
+        finally:
+            self.spool.seek(0, os.SEEK_END)
+
+
+class PodHealthWatcher(QObject):
+    """Follows pod status over one `vagrant ssh` session running `kubectl get pods --watch`.
+
+    Emits pod_changed for every status change and finished(healthy, unhealthy)
+    once every pod is ready, or when `timeout` seconds have passed.
+    """
+
+    pod_changed = pyqtSignal(str, str, bool)  # pod name, status, healthy
+    message = pyqtSignal(str)
+    finished = pyqtSignal(bool, dict)         # all healthy, {pod: status} of the rest
+
+    COMMAND = "kubectl get pods --watch --output-watch-events --no-headers"
+    SETTLE_MS = 1500    # quiet time after the initial listing before judging
+    MAX_RESTARTS = 3
+
+    def __init__(self, parent=None, timeout=180):
+        super().__init__(parent)
+        self.timeout = timeout
+        self.pods = {}          # name -> (status, healthy)
+        self.buffer = ""
+        self.restarts = 0
+        self.listed = False     # a pod row has arrived on this connection
+        self.settled = False
+        self.done = False
+
+        self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.MergedChannels)
+        self.process.readyReadStandardOutput.connect(self.handle_output)
+        self.process.finished.connect(self.handle_exit)
+        self.process.errorOccurred.connect(self.handle_error)
+
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.timeout.connect(self.handle_settled)
+
+        self.deadline = QTimer(self)
+        self.deadline.setSingleShot(True)
+        self.deadline.timeout.connect(self.handle_timeout)
+
+    def start(self, working_dir):
+        self.process.setWorkingDirectory(working_dir)
+        self.process.start("vagrant", ["ssh", "-c", self.COMMAND])
+        self.deadline.start(self.timeout * 1000)
+
+    def stop(self):
+        self.done = True
+        self.settle_timer.stop()
+        self.deadline.stop()
+        if self.process.state() != QProcess.NotRunning:
+            self.process.kill()
+            self.process.waitForFinished(2000)
+
+    def handle_output(self):
+        self.buffer += self.process.readAllStandardOutput().data().decode(errors="replace")
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            if self.parse_line(line.strip()):
+                self.listed = True
+        if self.settled:
+            self.evaluate()
+        elif self.listed:
+            # Judge once the stream goes quiet, so the initial listing is complete;
+            # a stray ssh or kubectl warning before it must not start the clock
+            self.settle_timer.start(self.SETTLE_MS)
+
+    def parse_line(self, line):
+        """Apply one watch line; returns whether it was a pod row."""
+        # EVENT NAME READY STATUS RESTARTS AGE
+        parts = line.split()
+        if len(parts) < 4 or parts[0] not in ("ADDED", "MODIFIED", "DELETED"):
+            if line:
+                self.message.emit(line)
+            return False
+        event, name, ready, status = parts[:4]
+        if event == "DELETED":
+            self.pods.pop(name, None)
+            return True
+        ready_now, _, wanted = ready.partition("/")
+        healthy = status == "Completed" or (status == "Running" and ready_now == wanted)
+        if self.pods.get(name) != (status, healthy):
+            self.pods[name] = (status, healthy)
+            self.pod_changed.emit(name, status, healthy)
+        return True
+
+    def handle_settled(self):
+        self.settled = True
+        self.evaluate()
+
+    def unhealthy(self):
+        return {name: status for name, (status, healthy) in self.pods.items() if not healthy}
+
+    def evaluate(self):
+        # No pods yet is not ready: the lab's workloads may still be getting scheduled
+        if self.done or not self.settled or not self.pods or self.unhealthy():
+            return
+        self.finish(True)
+
+    def handle_timeout(self):
+        if not self.done:
+            if not self.pods:
+                self.message.emit("❌ No pods were listed before the timeout.")
+            self.finish(False)
+
+    def handle_exit(self, *_):
+        if self.done:
+            return
+        if self.restarts < self.MAX_RESTARTS:
+            self.restarts += 1
+            self.message.emit(f"⚠ Pod watch ended, reconnecting ({self.restarts}/{self.MAX_RESTARTS})...")
+            self.pods.clear()
+            self.buffer = ""
+            self.listed = False
+            self.settled = False
+            QTimer.singleShot(2000, self.reconnect)
+        else:
+            self.message.emit("❌ Pod watch keeps failing, giving up.")
+            self.finish(False)
+
+    def handle_error(self, error):
+        # FailedToStart never emits finished; other errors are followed by it
+        if error == QProcess.FailedToStart and not self.done:
+            self.message.emit(f"❌ Could not start the pod watch: {self.process.errorString()}")
+            self.finish(False)
+
+    def reconnect(self):
+        if not self.done:
+            self.process.start("vagrant", ["ssh", "-c", self.COMMAND])
+
+    def finish(self, healthy):
+        unhealthy = self.unhealthy()
+        self.stop()
+        self.finished.emit(healthy, unhealthy)
+
+
 class ProgressPage(QWizardPage):
+    TOKEN_COMMAND = "kubectl -n kubernetes-dashboard get secret static-admin-user-token -o jsonpath='{.data.token}' | base64 --decode"
+
     def __init__(self):
         super().__init__()
         self.setTitle("Provisioning VM")
@@ -417,16 +682,16 @@ class ProgressPage(QWizardPage):
         self.provisioning_started = False
 
         self.layout = QVBoxLayout()
-        self.log_output = QTextEdit()
-        self.log_output.setReadOnly(True)
-        self.log_output.setStyleSheet("background-color: black; color: white;")
+        self.log_output = LogView()
         self.layout.addWidget(self.log_output)
         self.setLayout(self.layout)
 
         self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.MergedChannels)
         self.process.readyReadStandardOutput.connect(self.handle_output)
-        self.process.readyReadStandardError.connect(self.handle_output)
         self.process.finished.connect(self.process_finished)
+        self.health_watcher = None
+        self.token_process = None
 
     def initializePage(self):
         if self.provisioning_started:
@@ -434,7 +699,7 @@ class ProgressPage(QWizardPage):
         
         self.provisioning_started = True
         self.log_output.clear()
-        self.log_output.append('<span style="color:green;">🚀 Starting provisioning script...\n</span>')
+        self.log_output.append('🚀 Starting provisioning script...\n')
 
         wizard = self.wizard()
 
@@ -459,101 +724,70 @@ class ProgressPage(QWizardPage):
         wizard.button(QWizard.NextButton).setEnabled(False)
 
     def handle_output(self):
-        data = self.process.readAllStandardOutput().data().decode()
-        err = self.process.readAllStandardError().data().decode()
-        output = data + err
-
-        for line in output.strip().splitlines():
-            if "[OK]" in line:
-                self.log_output.append(f'<span style="color:green;">{line}</span>')
-            elif "[WARN]" in line:
-                self.log_output.append(f'<span style="color:orange;">{line}</span>')
-            elif "[ERROR]" in line:
-                self.log_output.append(f'<span style="color:red;">{line}</span>')
-            elif "[INFO]" in line:
-                self.log_output.append(f'<span style="color:cyan;">{line}</span>')
-            else:
-                self.log_output.append(line)
-
-        # self.log_output.append(output.strip())
-        self.log_output.verticalScrollBar().setValue(
-            self.log_output.verticalScrollBar().maximum()
-        )
+        # stderr is merged into stdout, so lines of the two never interleave mid-line
+        self.log_output.append_output(self.process.readAllStandardOutput().data())
 
     def process_finished(self):
-        wizard = self.wizard()
         self.wizard().provisioning_finished = True
+        self.log_output.end_output()
 
         if self.process.exitCode() == 0:
-            self.log_output.append('<span style="color:green;">\n✅ Provisioning complete.\n</span>')
+            self.log_output.append('\n✅ Provisioning complete.\n')
         else:
-            self.log_output.append('<span style="color:orange;">\n ⚠ Provisioning finished with errors.\n</span>')
-            self.log_output.append('<span style="color:orange;">🔍 Please scroll up and review any red or failed lines.n</span>')
-            self.log_output.append('<span style="color: red;">❌ Provisioning had errors. See above for details.</span>')
-
-        # 🧪 Get K8s Dashboard Token and save it to file
+            self.log_output.append('\n ⚠ Provisioning finished with errors.\n')
+            self.log_output.append('🔍 Please scroll up and review any red or failed lines.')
+            self.log_output.append('❌ Provisioning had errors. See above for details.')
+
+        # 🧪 Get K8s Dashboard Token and save it to file, without blocking the GUI
+        self.token_process = QProcess(self)
+        self.token_process.finished.connect(self.token_fetched)
+        self.token_process.errorOccurred.connect(self.token_error)
+        self.token_process.setWorkingDirectory(os.path.dirname(os.path.abspath(__file__)))
+        self.token_process.start("vagrant", ["ssh", "-c", self.TOKEN_COMMAND])
+
+        # ✅ Check pod health before finishing, without blocking the GUI
+        self.log_output.append("\n🔍 Checking pod health (timeout: 3 minutes)...\n")
+        self.health_watcher = PodHealthWatcher(self, timeout=180)
+        self.health_watcher.pod_changed.connect(self.pod_changed)
+        self.health_watcher.message.connect(self.log_output.append)
+        self.health_watcher.finished.connect(self.health_finished)
+        self.health_watcher.start(os.path.dirname(os.path.abspath(__file__)))
+
+    def token_fetched(self, exit_code, exit_status):
+        if exit_status != QProcess.NormalExit or exit_code != 0:
+            error = self.token_process.readAllStandardError().data().decode(errors="replace").strip()
+            print(f"\033[31m❌ Failed to get dashboard token: vagrant ssh exited with {exit_code}: {error}.\033[0m")
+            return
+        token = self.token_process.readAllStandardOutput().data().decode(errors="replace")
         try:
-            token = subprocess.check_output(
-                ["vagrant", "ssh", "-c", "kubectl -n kubernetes-dashboard get secret static-admin-user-token -o jsonpath='{.data.token}' | base64 --decode"],
-                universal_newlines=True
-            )
             with open("dashboard_token.txt", "w") as f:
                 f.write(token.strip())
             print("\033[32m✅ Saved K8s Dashboard token to dashboard_token.txt\033[0m")
-        except Exception as e:
-            print(f"\033[31m❌ Failed to get dashboard token: {e}.\033[0m")
+        except OSError as e:
+            print(f"\033[31m❌ Failed to save dashboard token: {e}.\033[0m")
 
-        # ✅ Check pod health before finishing
-        self.log_output.append("\n🔍 Checking pod health (timeout: 3 minutes)...\n")
-        QApplication.processEvents()
-        try:
-            start_time = time.time()
-            unhealthy = {}
-
-            while time.time() - start_time < 180:  # 3 minutes
-                result = subprocess.run(
-                    ["vagrant", "ssh", "-c", "kubectl get pods --no-headers"],
-                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-                )
-                lines = result.stdout.strip().splitlines()
-                all_healthy = True
-                unhealthy.clear()
+    def token_error(self, error):
+        # FailedToStart never emits finished; other errors are followed by it
+        if error == QProcess.FailedToStart:
+            print(f"\033[31m❌ Failed to get dashboard token: {self.token_process.errorString()}.\033[0m")
 
-                for line in lines:
-                    parts = line.split()
-                    pod_name = parts[0]
-                    status = parts[2] if len(parts) > 2 else "Unknown"
-                    if status not in ("Running", "Completed"):
-                        unhealthy[pod_name] = status
-                        all_healthy = False
-                        self.log_output.append(f'<span style="color:orange;">⚠ {pod_name}: {status}</span>')
-                        QApplication.processEvents()
-                    else:
-                        self.log_output.append(f'<span style="color:green;">✅ {pod_name}: {status}</span>')
-                        QApplication.processEvents()
-                    
-                if all_healthy:
-                    self.log_output.append('<span style="color:green;"> \n ✅ All pods are healthy! \n </span>')
-                    QApplication.processEvents()
-                    break
-                else:
-                    self.log_output.append("⏳ Waiting 10s before rechecking...\n")
-                    QApplication.processEvents()
-                    time.sleep(10)
-
-            if unhealthy:
-                self.log_output.append("\n⏰ Timeout reached. These pods are not healthy:\n")
-                QApplication.processEvents()
-                for pod, status in unhealthy.items():
-                    self.log_output.append(f"❌ {pod}: {status}")
-                    QApplication.processEvents()
-            else:
-                self.log_output.append('<span style="color:green;"> \n✅ Pod readiness check passed.\n </span>')
-                QApplication.processEvents()
+    def pod_changed(self, pod_name, status, healthy):
+        if healthy:
+            self.log_output.append(f'✅ {pod_name}: {status}')
+        else:
+            self.log_output.append(f'⚠ {pod_name}: {status}')
 
-        except Exception as e:
-            self.log_output.append(f'<span style="color:red;">❌ Pod health check error: {e}</span>')
-            QApplication.processEvents()
+    def health_finished(self, healthy, unhealthy):
+        wizard = self.wizard()
+
+        if healthy:
+            self.log_output.append('\n✅ All pods are healthy!\n')
+        elif unhealthy:
+            self.log_output.append("\n⏰ Timeout reached. These pods are not healthy:\n")
+            for pod, status in unhealthy.items():
+                self.log_output.append(f"❌ {pod}: {status}")
+        else:
+            self.log_output.append('❌ Pod health check did not complete. See above for details.')
 
         # Enable Back always
         wizard.button(QWizard.BackButton).setEnabled(True)
@@ -566,8 +800,13 @@ class ProgressPage(QWizardPage):
 
         # Remove Cancel button
         wizard.setOption(QWizard.HaveCustomButton1, False)
-        
+
     def cancel_setup(self):
+        if self.health_watcher:
+            self.health_watcher.stop()
+        if self.token_process and self.token_process.state() != QProcess.NotRunning:
+            self.token_process.kill()
+            self.token_process.waitForFinished(2000)
         if self.process and self.process.state() == QProcess.Running:
             self.process.kill()
             self.process.waitForFinished()
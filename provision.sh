@@ -62,6 +62,8 @@ if [ "$INSTALL_PYTHON" = "true" ]; then
   echo "[OK] 🐍 Installing Python..."
   apt install -y python3 python3-pip
   pip3 install --upgrade pip
+  # check_health.py streams pod events through the API client (falls back to kubectl without it)
+  pip3 install kubernetes
 fi
 
 # ─────────────────────────────────────────────
@@ -93,6 +95,11 @@ chown -R vagrant:vagrant /home/vagrant/kube-resilience-lab
 if [ "$INSTALL_CORE_APPS" = "true" ]; then
   echo "[OK] 🚀 Deploying core apps..."
 
+  # The url-prober Deployment runs check_urls.py --daemon from this ConfigMap
+  kubectl create configmap url-prober-scripts \
+    --from-file=/home/vagrant/check_urls.py --from-file=/home/vagrant/kube_common.py \
+    --dry-run=client -o yaml | kubectl apply -f -
+
   for file in /home/vagrant/kube-resilience-lab/kubernetes/manifests/*-{deployment,service}.yaml; do
     echo "[INFO] 📦 Applying $file"
     kubectl apply -f "$file"
@@ -0,0 +1,83 @@
+"""Shared gunicorn settings for the lab's Flask apps.
+
+    gunicorn -c common/gunicorn_conf.py
+
+Everything can be overridden per Deployment through environment variables.
+"""
+import math
+import os
+
+
+def cpu_quota():
+    """CPUs this container may actually use, honouring the cgroup CPU limit."""
+    try:  # cgroup v2
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:  # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+    return os.cpu_count() or 1
+
+
+def oom_kills():
+    """Processes the kernel has OOM killed in this container's memory cgroup, or None."""
+    for path in ("/sys/fs/cgroup/memory.events", "/sys/fs/cgroup/memory/memory.oom_control"):
+        try:  # cgroup v2, then v1
+            with open(path) as f:
+                for line in f:
+                    key, _, value = line.partition(" ")
+                    if key == "oom_kill":
+                        return int(value)
+        except (OSError, ValueError):
+            pass
+    return None
+
+
+wsgi_app = os.environ.get("APP_MODULE", "app:app")
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# os.cpu_count() reports the node's cores, not the pod's limit
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * cpu_quota() + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+# Must stay below the pod's terminationGracePeriodSeconds (30s by default)
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "20"))
+
+# Worker heartbeats on tmpfs; an overlay filesystem can stall them under disk load
+worker_tmp_dir = "/dev/shm"
+accesslog = "-"
+errorlog = "-"
+
+# Without a group-wide cgroup OOM kill only the worker dies and gets respawned,
+# so the container is never reported OOMKilled; "1" shuts the arbiter down too
+EXIT_ON_OOM = os.environ.get("GUNICORN_EXIT_ON_OOM") == "1"
+_oom_kills_seen = None
+
+
+def on_starting(server):
+    global _oom_kills_seen
+    _oom_kills_seen = oom_kills()
+    # Values left by a previous run would otherwise be summed into the new one
+    from common.metrics import reset_multiprocess_dir
+    reset_multiprocess_dir()
+
+
+def child_exit(server, worker):
+    from common.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+    if EXIT_ON_OOM and _oom_kills_seen is not None and (oom_kills() or 0) > _oom_kills_seen:
+        from gunicorn.errors import HaltServer
+        raise HaltServer(f"Worker (pid:{worker.pid}) was OOM killed", 1)
@@ -0,0 +1,154 @@
+"""Prometheus exposition shared by every app under python/apps.
+
+Single-process apps expose the default registry. Under gunicorn each worker
+writes its values to mmap-backed files in PROMETHEUS_MULTIPROC_DIR, and a scrape
+merges them, so /metrics reports the same totals whichever worker answers.
+"""
+import gzip
+import os
+import shutil
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+from prometheus_client.exposition import choose_encoder
+
+
+def multiprocess_dir():
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def build_registry():
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def reset_multiprocess_dir():
+    """Empty the value directory; call once in the parent before any worker starts."""
+    path = multiprocess_dir()
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges so they stop being reported.
+
+    Its counter and histogram files stay: removing them would make totals go
+    backwards.
+    """
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
+
+
+CACHE_TTL = float(os.environ.get("METRICS_CACHE_TTL", "1.0"))
+
+RENDER_SECONDS = Histogram(
+    'metrics_render_seconds', 'Time spent rendering the /metrics exposition', ['format'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1),
+)
+SCRAPES = Counter('metrics_scrapes_total', 'Scrapes of /metrics', ['format', 'cache'])
+
+
+class CachedExposition:
+    """Renders the registry at most once per `ttl` seconds and per format.
+
+    Merging the multiprocess files costs time proportional to workers x series,
+    and several ServiceMonitors may scrape within the same second. Rendering is
+    done under a lock, so concurrent scrapes wait for one render instead of
+    each doing their own. The gzip body is compressed once per render and then
+    reused.
+    """
+
+    def __init__(self, registry=None, ttl=CACHE_TTL):
+        self.registry = registry
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache = {}  # content type -> [rendered_at, body, gzipped body or None]
+
+    def render(self, accept=None, gzipped=False):
+        """Return (body, content_type) for the format negotiated from `accept`."""
+        encoder, content_type = choose_encoder(accept or "")
+        fmt = "openmetrics" if content_type.startswith("application/openmetrics-text") else "text"
+        with self._lock:
+            now = time.monotonic()
+            entry = self._cache.get(content_type)
+            if entry is None or now - entry[0] >= self.ttl:
+                if self.registry is None:
+                    self.registry = build_registry()
+                with RENDER_SECONDS.labels(fmt).time():
+                    entry = [now, encoder(self.registry), None]
+                self._cache[content_type] = entry
+                SCRAPES.labels(fmt, "miss").inc()
+            else:
+                SCRAPES.labels(fmt, "hit").inc()
+            if not gzipped:
+                return entry[1], content_type
+            if entry[2] is None:
+                entry[2] = gzip.compress(entry[1], compresslevel=6)
+            return entry[2], content_type
+
+
+exposition = CachedExposition()
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip: listed (or `*`) with q > 0."""
+    qualities = {}
+    for part in (accept_encoding or "").split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+    for coding in ("gzip", "x-gzip", "*"):  # an explicit gzip entry overrides `*`
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def metrics_response(headers=None):
+    """Return value for a Flask/Quart `/metrics` view: `metrics_response(request.headers)`."""
+    headers = headers or {}
+    gzipped = accepts_gzip(headers.get("Accept-Encoding"))
+    body, content_type = exposition.render(headers.get("Accept"), gzipped)
+    response_headers = {"Content-Type": content_type, "Vary": "Accept, Accept-Encoding"}
+    if gzipped:
+        response_headers["Content-Encoding"] = "gzip"
+    return body, 200, response_headers
+
+
+# Standalone server for apps that are not web apps themselves (the remediator)
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def wsgi_app(environ, start_response):
+    body, status, headers = metrics_response({
+        "Accept": environ.get("HTTP_ACCEPT"),
+        "Accept-Encoding": environ.get("HTTP_ACCEPT_ENCODING"),
+    })
+    start_response(f"{status} OK", list(headers.items()))
+    return [body]
+
+
+def start_http_server(port, addr="0.0.0.0"):
+    server = make_server(addr, port, wsgi_app, _ThreadingWSGIServer, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
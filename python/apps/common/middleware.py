@@ -0,0 +1,119 @@
+"""Per-route request metrics for the lab's Flask apps.
+
+    app = Flask(__name__)
+    instrument(app)
+
+Wraps the WSGI callable rather than using after_request, so unhandled errors
+and streamed responses are measured too (a streamed response is timed until
+its last byte is sent).
+
+This does not meet the "few microseconds" budget it was asked for:
+benchmarks/metrics_overhead_bench.py measures about 7us per request
+single-process and 10-16us with PROMETHEUS_MULTIPROC_DIR set, as under
+gunicorn. Nearly all of it is the four prometheus_client updates (two
+histogram observations, the in-flight inc and dec), each taking a lock
+and, in multiprocess mode, writing to an mmap file.
+"""
+from time import perf_counter
+
+from flask import request
+from prometheus_client import Gauge, Histogram
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ['method', 'route', 'status'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'HTTP response body size', ['method', 'route'],
+    buckets=(128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608),
+)
+IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests currently being served', multiprocess_mode='livesum')
+
+ROUTE_KEY = 'kubelab.route'
+
+
+class MetricsMiddleware:
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        # Label lookups cost more than the observation itself; resolve each
+        # (method, route, status) combination to its two children once.
+        self._children = {}
+
+    def __call__(self, environ, start_response):
+        start = perf_counter()
+        IN_FLIGHT.inc()
+        state = ['500', None]  # status, Content-Length
+
+        def _start_response(status, headers, exc_info=None):
+            state[0] = status[:3]
+            for name, value in headers:
+                if name.lower() == 'content-length':
+                    state[1] = int(value)
+                    break
+            return start_response(status, headers, exc_info)
+
+        try:
+            body = self.wsgi_app(environ, _start_response)
+        except Exception:
+            self._observe(environ, state[0], 0, start)
+            raise
+        return _MeteredBody(self, environ, body, state, start)
+
+    def _observe(self, environ, status, size, start):
+        elapsed = perf_counter() - start
+        IN_FLIGHT.dec()
+        method = environ.get('REQUEST_METHOD', '')
+        route = environ.get(ROUTE_KEY, 'unmatched')
+
+        children = self._children.get((method, route, status))
+        if children is None:
+            children = self._children[method, route, status] = (
+                REQUEST_LATENCY.labels(method, route, status), RESPONSE_SIZE.labels(method, route),
+            )
+        children[0].observe(elapsed)
+        children[1].observe(size)
+
+
+class _MeteredBody:
+    """Response iterable that records the request once the server closes it."""
+
+    __slots__ = ('middleware', 'environ', 'body', 'state', 'start', 'sent')
+
+    def __init__(self, middleware, environ, body, state, start):
+        self.middleware = middleware
+        self.environ = environ
+        self.body = body
+        self.state = state
+        self.start = start
+        self.sent = 0
+
+    def __iter__(self):
+        if self.state[1] is not None:
+            return iter(self.body)
+        return self._counting()
+
+    def _counting(self):
+        # Only streamed responses (no Content-Length) pay for counting bytes
+        for chunk in self.body:
+            self.sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            size = self.state[1] if self.state[1] is not None else self.sent
+            self.middleware._observe(self.environ, self.state[0], size, self.start)
+
+
+def _remember_route():
+    # Templated rule ("/delete/<int:id>"), not the raw path, to keep label cardinality bounded
+    rule = request.url_rule
+    request.environ[ROUTE_KEY] = rule.rule if rule is not None else 'unmatched'
+
+
+def instrument(app):
+    app.before_request(_remember_route)
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+    return app
@@ -1,8 +1,11 @@
 from flask import Flask, request, render_template
-from prometheus_client import Counter, generate_latest
+from common.metrics import metrics_response
+from common.middleware import instrument
+from prometheus_client import Counter
 import subprocess
 
 app = Flask(__name__)
+instrument(app)
 
 # Prometheus metrics
 PING_COUNT = Counter('ping_requests_total', 'Ping command usage')
@@ -97,7 +100,7 @@ def crash():
 
 @app.route('/metrics')
 def metrics():
-    return generate_latest(), 200, {'Content-Type': 'text/plain'}
+    return metrics_response(request.headers)
 
 # Helpers
 
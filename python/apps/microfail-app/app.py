@@ -1,8 +1,11 @@
-from flask import Flask, jsonify
-from prometheus_client import Counter, generate_latest
+from flask import Flask, jsonify, request
+from common.metrics import metrics_response
+from common.middleware import instrument
+from prometheus_client import Counter
 import time, threading, os
 
 app = Flask(__name__)
+instrument(app)
 
 # Prometheus metrics
 REQUESTS = Counter('http_requests_total', 'Total HTTP Requests', ['code'])
@@ -48,7 +51,7 @@ def diskfill():
 
 @app.route('/metrics')
 def metrics():
-    return generate_latest(), 200, {'Content-Type': 'text/plain'}
+    return metrics_response(request.headers)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000)
@@ -0,0 +1,309 @@
+"""Remediation actions and the rules that pick one.
+
+A rollout restart replaces every pod of a workload, which is wasteful when a
+single pod is unhealthy and useless when the pod keeps running out of memory.
+Each Action here fixes one kind of failure; execute() walks RULES (first
+match wins) and runs the first action that can handle the triggering labels.
+An action that can't apply (no pod label, limit already at its cap, last
+schedulable node...) raises NotApplicable and the next matching rule is
+tried. The last rule, a rollout restart, always applies.
+
+Rules match series/alert labels with regular expressions, for example:
+
+    {"match": {"alertname": "KubeLabContainerOOMKilled"}, "action": "raise_limit", "params": {"resource": "memory"}}
+
+REMEDIATION_RULES_FILE can point to a JSON list of rules that replaces the
+defaults.
+"""
+import json
+import math
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from kubernetes.utils import parse_quantity
+from prometheus_client import Counter, Histogram
+
+from policy import replica_counts
+
+ACTION_COUNTER = Counter('remediator_actions_total', 'Remediation actions run', ['action', 'outcome'])
+ACTION_SECONDS = Histogram(
+    'remediator_action_seconds', 'Time spent in the Kubernetes API per action', ['action'],
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+PODS_DISRUPTED = Counter('remediator_action_pods_disrupted_total', 'Pods restarted or evicted by each action', ['action'])
+API_CALLS = Counter('remediator_action_api_calls_total', 'Kubernetes API calls made by each action', ['action'])
+TIME_TO_RECOVERY = Histogram(
+    'remediator_time_to_recovery_seconds', 'Time from an action until its workload is ready again', ['action'],
+    buckets=(5, 10, 20, 30, 60, 120, 300, 600, 900),
+)
+RECOVERY_TIMEOUTS = Counter('remediator_recovery_timeouts_total', 'Actions whose workload did not recover in time', ['action'])
+
+# Restart = bump the pod template annotation, same for every workload kind
+PATCH = {
+    "Deployment": "patch_namespaced_deployment",
+    "StatefulSet": "patch_namespaced_stateful_set",
+    "DaemonSet": "patch_namespaced_daemon_set",
+}
+READ = {
+    "Deployment": "read_namespaced_deployment",
+    "StatefulSet": "read_namespaced_stateful_set",
+    "DaemonSet": "read_namespaced_daemon_set",
+}
+
+Clients = namedtuple("Clients", "apps core")
+
+
+class NotApplicable(Exception):
+    pass
+
+
+def read_workload(clients, target):
+    return getattr(clients.apps, READ[target.kind])(name=target.name, namespace=target.namespace)
+
+
+class Action(ABC):
+    """Base class. run() performs the action and returns (pods disrupted, API calls)."""
+
+    name = None
+
+    @abstractmethod
+    def run(self, clients, target, labels, **params):
+        ...
+
+
+class RolloutRestart(Action):
+    name = "rollout_restart"
+
+    def run(self, clients, target, labels, **params):
+        workload = getattr(clients.apps, PATCH[target.kind])(
+            name=target.name,
+            namespace=target.namespace,
+            body={"spec": {"template": {"metadata": {"annotations": {"restarted-at": str(time.time())}}}}}
+        )
+        desired = replica_counts(workload)[0] if hasattr(workload, "status") else None
+        return desired or 1, 1
+
+
+class DeletePod(Action):
+    """Delete only the failing pod; its controller replaces it and the others keep serving."""
+
+    name = "delete_pod"
+
+    def run(self, clients, target, labels, **params):
+        pod = labels.get("pod")
+        if not pod:
+            raise NotApplicable("no pod label")
+        clients.core.delete_namespaced_pod(name=pod, namespace=target.namespace)
+        return 1, 1
+
+
+class ScaleOut(Action):
+    """Add `step` replicas, up to `max_replicas`; for saturation rather than breakage."""
+
+    name = "scale_out"
+    SCALE = {
+        "Deployment": ("read_namespaced_deployment_scale", "patch_namespaced_deployment_scale"),
+        "StatefulSet": ("read_namespaced_stateful_set_scale", "patch_namespaced_stateful_set_scale"),
+    }
+
+    def run(self, clients, target, labels, step=1, max_replicas=10, **params):
+        if target.kind not in self.SCALE:
+            raise NotApplicable(f"can't scale a {target.kind}")
+        read, patch = self.SCALE[target.kind]
+        current = getattr(clients.apps, read)(name=target.name, namespace=target.namespace).spec.replicas or 0
+        wanted = min(max_replicas, current + step)
+        if wanted <= current:
+            raise NotApplicable(f"already at {current} replicas")
+        getattr(clients.apps, patch)(name=target.name, namespace=target.namespace, body={"spec": {"replicas": wanted}})
+        print(f"📈 Scaling {target} from {current} to {wanted} replicas", flush=True)
+        return 0, 2
+
+
+class RaiseLimit(Action):
+    """Multiply a container resource limit (memory by default) by `factor`, capped at `cap`.
+
+    Only containers that already have that limit are touched, or just the one
+    named by the `container` label. This rolls the workload like a restart,
+    but the new pods no longer hit the same limit.
+    """
+
+    name = "raise_limit"
+
+    def run(self, clients, target, labels, resource="memory", factor=1.5, cap="2Gi", **params):
+        workload = read_workload(clients, target)
+        only = labels.get("container")
+        limit_cap = parse_quantity(cap)
+        patches = []
+        for container in workload.spec.template.spec.containers:
+            limits = (container.resources.limits if container.resources else None) or {}
+            if (only and container.name != only) or resource not in limits:
+                continue
+            current = parse_quantity(limits[resource])
+            raised = min(limit_cap, current * parse_quantity(str(factor)))
+            if raised > current:
+                quantity = format_quantity(resource, raised)
+                patches.append({"name": container.name, "resources": {"limits": {resource: quantity}}})
+                print(f"📏 Raising {resource} limit of {target}/{container.name}: {limits[resource]} -> {quantity}", flush=True)
+        if not patches:
+            raise NotApplicable(f"no {resource} limit below {cap} to raise")
+        # Strategic merge: containers are matched by name, other fields kept
+        getattr(clients.apps, PATCH[target.kind])(
+            name=target.name, namespace=target.namespace,
+            body={"spec": {"template": {"spec": {"containers": patches}}}},
+        )
+        desired, _ = replica_counts(workload)
+        return desired or 1, 2
+
+
+def format_quantity(resource, value):
+    """A parse_quantity() Decimal back as a Kubernetes quantity: millicores for cpu, Mi or bytes otherwise."""
+    if resource == "cpu":
+        return f"{math.ceil(value * 1000)}m"
+    value = math.ceil(value)
+    return f"{value // 2**20}Mi" if value % 2**20 == 0 else str(value)
+
+
+class CordonNode(Action):
+    """Cordon the failing pod's node and delete the pod so it is rescheduled elsewhere.
+
+    Never cordons the last schedulable node. The node stays cordoned until an
+    operator runs `kubectl uncordon`.
+    """
+
+    name = "cordon_node"
+
+    def run(self, clients, target, labels, **params):
+        pod = labels.get("pod")
+        if not pod:
+            raise NotApplicable("no pod label")
+        node = labels.get("node") or clients.core.read_namespaced_pod(name=pod, namespace=target.namespace).spec.node_name
+        schedulable = [n.metadata.name for n in clients.core.list_node().items if not n.spec.unschedulable]
+        if node not in schedulable or len(schedulable) < 2:
+            raise NotApplicable(f"{node} is already cordoned or the last schedulable node")
+        clients.core.patch_node(name=node, body={"spec": {"unschedulable": True}})
+        clients.core.delete_namespaced_pod(name=pod, namespace=target.namespace)
+        print(f"🚧 Cordoned {node}; run 'kubectl uncordon {node}' once it is healthy", flush=True)
+        return 1, 4
+
+
+ACTIONS = {action.name: action for action in (RolloutRestart(), DeletePod(), ScaleOut(), RaiseLimit(), CordonNode())}
+
+DEFAULT_RULES = [
+    # devops-utils' /memory route allocates past its limit to exercise this one
+    {"match": {"alertname": "KubeLabContainerOOMKilled"}, "action": "raise_limit", "params": {"resource": "memory"}},
+    {"match": {"reason": "OOMKilled"}, "action": "raise_limit", "params": {"resource": "memory"}},
+    {"match": {"alertname": "KubeLabContainerDiskFilling"}, "action": "delete_pod"},
+    {"match": {"alertname": "KubeLabNodePressure"}, "action": "cordon_node"},
+    {"match": {"alertname": "KubeLabHighLatency"}, "action": "scale_out", "params": {"step": 1, "max_replicas": 5}},
+    {"match": {"pod": ".+"}, "action": "delete_pod"},
+    {"match": {}, "action": "rollout_restart"},
+]
+
+
+def load_rules(path=None):
+    """The rules from `path` (a JSON list), or DEFAULT_RULES; regexes compiled once."""
+    rules = DEFAULT_RULES
+    if path:
+        with open(path) as f:
+            rules = json.load(f)
+    compiled = []
+    for rule in rules:
+        if rule["action"] not in ACTIONS:
+            raise ValueError(f"unknown remediation action: {rule['action']}")
+        match = {label: re.compile(pattern) for label, pattern in rule.get("match", {}).items()}
+        compiled.append((match, ACTIONS[rule["action"]], rule.get("params", {})))
+    if not compiled or compiled[-1][1].name != "rollout_restart" or compiled[-1][0]:
+        compiled.append(({}, ACTIONS["rollout_restart"], {}))  # always have something that applies
+    return compiled
+
+
+def execute(clients, target, labels, rules):
+    """Run the first matching, applicable action on `target`; returns its name."""
+    for match, action, params in rules:
+        if not all(pattern.fullmatch(labels.get(label, "")) for label, pattern in match.items()):
+            continue
+        start = time.monotonic()
+        try:
+            disrupted, calls = action.run(clients, target, labels, **params)
+        except NotApplicable as e:
+            # Not timed: a no-op would drag the API latency histogram down
+            ACTION_COUNTER.labels(action=action.name, outcome="not_applicable").inc()
+            print(f"↪️ {action.name} does not apply to {target}: {e}", flush=True)
+            continue
+        except Exception:
+            ACTION_SECONDS.labels(action=action.name).observe(time.monotonic() - start)
+            ACTION_COUNTER.labels(action=action.name, outcome="error").inc()
+            raise
+        ACTION_SECONDS.labels(action=action.name).observe(time.monotonic() - start)
+        ACTION_COUNTER.labels(action=action.name, outcome="success").inc()
+        PODS_DISRUPTED.labels(action=action.name).inc(disrupted)
+        API_CALLS.labels(action=action.name).inc(calls)
+        return action.name
+    raise NotApplicable(f"no remediation rule applies to {target}")
+
+
+class RecoveryTracker:
+    """Times how long each acted-on workload takes to become fully ready again.
+
+    Polls the workloads with outstanding actions every `interval` seconds and
+    gives up after `timeout`.
+    """
+
+    def __init__(self, read, interval=5, timeout=900, clock=time.monotonic):
+        self.read = read
+        self.interval = interval
+        self.timeout = timeout
+        self.clock = clock
+        self._pending = {}  # target -> (action name, clock() when it ran)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def track(self, target, action):
+        with self._lock:
+            self._pending[target] = (action, self.clock())
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def start(self):
+        threading.Thread(target=self.run, name="recovery-tracker", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        for target, (action, started) in self.pending().items():
+            elapsed = self.clock() - started
+            try:
+                recovered = is_ready(self.read(target))
+            except Exception as e:
+                print(f"⚠️ Could not check recovery of {target}: {e}", flush=True)
+                recovered = False
+            if recovered:
+                TIME_TO_RECOVERY.labels(action=action).observe(elapsed)
+                print(f"✅ {target} recovered {elapsed:.0f}s after {action}", flush=True)
+            elif elapsed >= self.timeout:
+                RECOVERY_TIMEOUTS.labels(action=action).inc()
+                print(f"⌛ {target} still not ready {elapsed:.0f}s after {action}", flush=True)
+            else:
+                continue
+            with self._lock:
+                if self._pending.get(target, (None, None))[1] == started:
+                    del self._pending[target]
+
+
+def is_ready(workload):
+    """The controller has caught up with the latest spec and every desired replica is ready."""
+    if (workload.status.observed_generation or 0) < (workload.metadata.generation or 0):
+        return False
+    desired, ready = replica_counts(workload)
+    return (ready or 0) >= (desired or 0)
@@ -0,0 +1,152 @@
+"""Event-driven failure detection.
+
+Two sources report failures as soon as they happen instead of waiting for
+the next Prometheus poll:
+
+- AlertmanagerWebhook: receives Alertmanager webhook notifications and passes
+  each firing alert's labels on, to be resolved to a workload.
+- DeploymentWatcher: streams Deployment changes from the Kubernetes API and
+  reports a Deployment as soon as it has no available replicas.
+
+Polling in remediator.py stays in place as the fallback.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import Flask, jsonify, request
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from prometheus_client import Counter
+from werkzeug.serving import make_server
+
+from targets import Workload
+
+DETECTION_COUNTER = Counter('remediator_detections_total', 'Failed jobs reported, by detection source', ['source'])
+WATCH_RESTARTS = Counter('remediator_watch_restarts_total', 'Times the Deployment watch had to reconnect')
+
+
+class AlertmanagerWebhook:
+    """Serves POST /alerts for Alertmanager's webhook receiver; calls on_failure(labels) per firing alert.
+
+    If on_failure returns False (another replica owns that target) the request
+    is answered with 503, so Alertmanager retries it and the Service can route
+    the retry to a different replica.
+    """
+
+    def __init__(self, on_failure, port=8002, host="0.0.0.0", ignore_jobs=("remediator",)):
+        self.on_failure = on_failure
+        self.ignore_jobs = set(ignore_jobs)
+        self.app = Flask(__name__)
+        self.app.add_url_rule("/alerts", view_func=self.receive, methods=["POST"])
+        self.server = make_server(host, port, self.app, threaded=True)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="alert-webhook", daemon=True).start()
+        return self
+
+    def receive(self):
+        payload = request.get_json(silent=True) or {}
+        reported, rejected = [], []
+        for alert in payload.get("alerts", []):
+            labels = alert.get("labels", {})
+            job = labels.get("job")
+            if alert.get("status") != "firing" or not job or job in self.ignore_jobs or labels in reported:
+                continue
+            reported.append(labels)
+            print(f"🔔 Alertmanager reports {job} down", flush=True)
+            DETECTION_COUNTER.labels(source="webhook").inc()
+            if self.on_failure(labels) is False:
+                rejected.append(job)
+        accepted = [labels["job"] for labels in reported if labels["job"] not in rejected]
+        return jsonify(accepted=accepted, rejected=rejected), 503 if rejected else 200
+
+
+class DeploymentWatcher:
+    """Watches Deployments and calls on_failure(Workload) for ones with zero available replicas.
+
+    `namespaces` limits the watch to those namespaces; None watches the whole cluster.
+
+    Deployments that are still rolling out (generation not yet observed) or that
+    were created less than `grace` seconds ago are left alone, so a normal
+    rollout is not mistaken for an outage. Each outage is reported once, when the
+    Deployment goes down, not on every status update that follows.
+    """
+
+    def __init__(self, apps_v1, on_failure, namespaces=None, grace=60,
+                 ignore_jobs=("remediator",), timeout_seconds=300):
+        self.apps_v1 = apps_v1
+        self.on_failure = on_failure
+        self.namespaces = namespaces
+        self.grace = grace
+        self.ignore_jobs = set(ignore_jobs)
+        self.timeout_seconds = timeout_seconds
+        self._stopped = threading.Event()
+        self._down = set()
+
+    def start(self):
+        if self.namespaces:
+            for ns in self.namespaces:
+                threading.Thread(target=self.run, args=(self.apps_v1.list_namespaced_deployment, {"namespace": ns}),
+                                 name=f"deployment-watch-{ns}", daemon=True).start()
+        else:
+            threading.Thread(target=self.run, args=(self.apps_v1.list_deployment_for_all_namespaces, {}),
+                             name="deployment-watch", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self, list_fn, kwargs):
+        resource_version = None
+        while not self._stopped.is_set():
+            w = watch.Watch()
+            try:
+                for event in w.stream(
+                    list_fn,
+                    resource_version=resource_version,
+                    timeout_seconds=self.timeout_seconds,
+                    **kwargs,
+                ):
+                    deployment = event["object"]
+                    resource_version = deployment.metadata.resource_version
+                    self.handle(event["type"], deployment)
+                    if self._stopped.is_set():
+                        break
+            except ApiException as e:
+                if e.status == 410:  # resourceVersion too old: relist
+                    resource_version = None
+                else:
+                    print(f"❌ Deployment watch failed: {e}", flush=True)
+                    time.sleep(5)
+                WATCH_RESTARTS.inc()
+            except Exception as e:
+                print(f"❌ Deployment watch failed: {e}", flush=True)
+                WATCH_RESTARTS.inc()
+                time.sleep(5)
+            finally:
+                w.stop()
+
+    def handle(self, event_type, deployment):
+        workload = Workload("Deployment", deployment.metadata.namespace, deployment.metadata.name)
+        if event_type == "DELETED" or not self.is_down(deployment):
+            self._down.discard(workload)
+            return
+        if workload in self._down:
+            return
+        self._down.add(workload)
+        DETECTION_COUNTER.labels(source="watch").inc()
+        print(f"👀 Watch: {workload} has no available replicas", flush=True)
+        self.on_failure(workload)
+
+    def is_down(self, deployment):
+        name = deployment.metadata.name
+        if name in self.ignore_jobs or not deployment.spec.replicas:
+            return False
+        status = deployment.status
+        if (status.observed_generation or 0) < (deployment.metadata.generation or 0):
+            return False
+        created = deployment.metadata.creation_timestamp
+        if created and (datetime.now(timezone.utc) - created).total_seconds() < self.grace:
+            return False
+        return not status.available_replicas
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+IN_FLIGHT = Gauge('remediator_in_flight', 'Remediations currently running')
+SKIPPED_COUNTER = Counter('remediator_skipped_total', 'Remediations skipped because one was already running', ['job'])
+REMEDIATION_SECONDS = Histogram(
+    'remediator_remediation_seconds', 'Time taken by a single remediation', ['job'],
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 30),
+)
+
+
+class RemediationEngine:
+    """Runs remediations in parallel on a bounded pool, never twice at once for the same job."""
+
+    def __init__(self, action, max_workers=8, executor=None):
+        self.action = action
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="remediate")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, job, *args):
+        """Schedule `action(job, *args)`; returns its future, or None if `job` is already being remediated."""
+        with self._lock:
+            if job in self._in_flight:
+                SKIPPED_COUNTER.labels(job=str(job)).inc()
+                return None
+            self._in_flight.add(job)
+            IN_FLIGHT.set(len(self._in_flight))
+        try:
+            return self._executor.submit(self._run, job, *args)
+        except RuntimeError:  # executor shut down
+            self._done(job)
+            raise
+
+    def in_flight(self):
+        with self._lock:
+            return set(self._in_flight)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, *args):
+        start = time.monotonic()
+        try:
+            return self.action(job, *args)
+        finally:
+            REMEDIATION_SECONDS.labels(job=str(job)).observe(time.monotonic() - start)
+            self._done(job)
+
+    def _done(self, job):
+        with self._lock:
+            self._in_flight.discard(job)
+            IN_FLIGHT.set(len(self._in_flight))
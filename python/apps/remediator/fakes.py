@@ -0,0 +1,102 @@
+"""In-memory stand-ins for the Kubernetes API, for benchmarks and offline runs."""
+import copy
+from concurrent.futures import Future
+import threading
+import time
+from types import SimpleNamespace
+
+from kubernetes.client.rest import ApiException
+
+
+class FakeAppsV1Api:
+    """Records deployment patches, taking `latency` seconds per call like a real API round trip."""
+
+    def __init__(self, latency=0.0, sleep=time.sleep):
+        self.latency = latency
+        self.sleep = sleep
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def patch_namespaced_deployment(self, name, namespace, body):
+        if self.latency:
+            self.sleep(self.latency)
+        with self._lock:
+            self.calls.append(("patch_namespaced_deployment", namespace, name))
+        return body
+
+
+class FakeCoordinationV1Api:
+    """In-memory Lease store with the API server's create/replace conflict rules.
+
+    create fails with 409 if the Lease exists; replace fails with 409 if the
+    body's resourceVersion is stale and 404 if the Lease is gone. Callers get
+    copies, like objects decoded from a real response.
+    """
+
+    def __init__(self):
+        self.leases = {}  # (namespace, name) -> V1Lease
+        self.calls = 0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def create_namespaced_lease(self, namespace, body):
+        with self._lock:
+            self.calls += 1
+            key = (namespace, body.metadata.name)
+            if key in self.leases:
+                raise ApiException(status=409, reason="AlreadyExists")
+            return self._store(key, body)
+
+    def replace_namespaced_lease(self, name, namespace, body):
+        with self._lock:
+            self.calls += 1
+            current = self.leases.get((namespace, name))
+            if current is None:
+                raise ApiException(status=404, reason="NotFound")
+            if body.metadata.resource_version != current.metadata.resource_version:
+                raise ApiException(status=409, reason="Conflict")
+            return self._store((namespace, name), body)
+
+    def delete_namespaced_lease(self, name, namespace):
+        with self._lock:
+            self.calls += 1
+            if self.leases.pop((namespace, name), None) is None:
+                raise ApiException(status=404, reason="NotFound")
+
+    def list_namespaced_lease(self, namespace, label_selector=""):
+        wanted = dict(term.split("=", 1) for term in label_selector.split(",") if term)
+        with self._lock:
+            self.calls += 1
+            items = [
+                copy.deepcopy(lease) for (ns, _), lease in self.leases.items()
+                if ns == namespace and wanted.items() <= (lease.metadata.labels or {}).items()
+            ]
+        return SimpleNamespace(items=items)
+
+    def holders(self, namespace="default"):
+        """{lease name: holder identity}, for checking who owns what."""
+        with self._lock:
+            return {name: lease.spec.holder_identity for (ns, name), lease in self.leases.items() if ns == namespace}
+
+    def _store(self, key, body):
+        self._version += 1
+        lease = copy.deepcopy(body)
+        lease.metadata.namespace = key[0]
+        lease.metadata.resource_version = str(self._version)
+        self.leases[key] = lease
+        return copy.deepcopy(lease)
+
+
+class InlineExecutor:
+    """Executor that runs each task in the caller's thread, for deterministic simulated runs."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
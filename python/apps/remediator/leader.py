@@ -0,0 +1,248 @@
+"""Lease-based leader election, optionally sharded across replicas.
+
+Targets are split into `shards` fixed shards (hash of the target). Each shard
+is guarded by a coordination.k8s.io Lease, and a replica only remediates
+targets whose shard Lease it currently holds, so two replicas never act on the
+same target.
+
+- shards=1 is plain leader election: every replica competes for the single
+  Lease and the holder does all the work; the others stay warm and take over
+  once it stops renewing.
+- shards>1 spreads the work: each replica keeps a member Lease alive, and
+  shards are assigned to the live members with a consistent-hash ring. A
+  replica only tries to hold the shards the ring gives it and releases the
+  rest, so adding or losing a replica moves only its share of the shards.
+
+Replicas treat a held shard as theirs until `lease_duration - renew_period`
+after the last successful renew, so a replica that cannot reach the API server
+stops acting before anyone else is allowed to take its shards over.
+"""
+import bisect
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from prometheus_client import Counter, Gauge
+
+SHARDS_HELD = Gauge('remediator_shards_held', 'Remediation shards whose Lease this replica holds')
+IS_LEADER = Gauge('remediator_is_leader', '1 while this replica holds at least one remediation shard')
+LEASE_TRANSITIONS = Counter('remediator_lease_transitions_total', 'Shard Leases acquired or lost by this replica', ['change'])
+
+GROUP_LABEL = "kube-lab/lease-group"
+ROLE_LABEL = "kube-lab/lease-role"
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring with `vnodes` points per member."""
+
+    def __init__(self, members, vnodes=64):
+        points = sorted((_hash(f"{member}#{i}"), member) for member in members for i in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def owner(self, key):
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+
+class LeaseElector:
+    """Holds the shard Leases this replica is entitled to; see the module docstring."""
+
+    def __init__(self, coordination_v1, identity, namespace="default", name="remediator", shards=1,
+                 lease_duration=15, renew_period=5, clock=time.time):
+        self.api = coordination_v1
+        self.identity = identity
+        self.namespace = namespace
+        self.name = name
+        self.shards = shards
+        self.lease_duration = lease_duration
+        self.renew_period = renew_period
+        self.clock = clock
+        self._held = {}  # shard -> clock() until which we may act on it
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    # -- queries -------------------------------------------------------------
+
+    def shard_of(self, key):
+        return _hash(str(key)) % self.shards
+
+    def owns(self, key):
+        """True if this replica may remediate `key` right now."""
+        shard = self.shard_of(key)
+        with self._lock:
+            until = self._held.get(shard)
+        return until is not None and self.clock() < until
+
+    def held(self):
+        now = self.clock()
+        with self._lock:
+            return sorted(s for s, until in self._held.items() if now < until)
+
+    # -- loop ----------------------------------------------------------------
+
+    def start(self):
+        threading.Thread(target=self.run, name="lease-elector", daemon=True).start()
+        return self
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"❌ Leader election failed: {e}", flush=True)
+            self._stopped.wait(self.renew_period)
+
+    def stop(self, release=True):
+        """Stop renewing; with `release`, hand the held shards back so failover is immediate."""
+        self._stopped.set()
+        if not release:
+            return
+        for lease in self._list():
+            if lease.spec.holder_identity != self.identity:
+                continue
+            if lease.metadata.labels.get(ROLE_LABEL) == "member":
+                self._delete(lease)
+            else:
+                lease.spec.holder_identity = None
+                self._replace(lease)
+        with self._lock:
+            self._held.clear()
+        self._export()
+
+    def tick(self):
+        """One election round: renew, take over, or release shard Leases as needed."""
+        now = self.clock()
+        leases = {lease.metadata.name: lease for lease in self._list()}
+        ring = None
+        if self.shards > 1:
+            self._heartbeat(leases.get(self._member_name()), now)
+            members = {self.identity}
+            for lease in leases.values():
+                if lease.metadata.labels.get(ROLE_LABEL) != "member":
+                    continue
+                if not self._expired(lease, now):
+                    members.add(lease.spec.holder_identity)
+                elif self._expired(lease, now - 4 * self.lease_duration):
+                    self._delete(lease)  # member Leases of pods that are long gone
+            ring = HashRing(sorted(members))
+
+        for shard in range(self.shards):
+            lease_name = self._shard_name(shard)
+            wanted = ring is None or ring.owner(lease_name) == self.identity
+            self._step(shard, leases.get(lease_name), wanted, now)
+        self._export()
+
+    # -- lease handling ------------------------------------------------------
+
+    def _step(self, shard, lease, wanted, now):
+        if lease is None:
+            acquired = wanted and self._create(self._shard_name(shard), "shard", now)
+        elif lease.spec.holder_identity == self.identity:
+            if wanted:
+                acquired = self._renew(lease, now)
+            else:
+                lease.spec.holder_identity = None
+                self._replace(lease)
+                acquired = False
+        elif wanted and (not lease.spec.holder_identity or self._expired(lease, now)):
+            lease.spec.holder_identity = self.identity
+            lease.spec.acquire_time = _micro(now)
+            lease.spec.lease_transitions = (lease.spec.lease_transitions or 0) + 1
+            acquired = self._renew(lease, now)
+        else:
+            acquired = False
+
+        with self._lock:
+            had = shard in self._held
+            if acquired:
+                self._held[shard] = now + self.lease_duration - self.renew_period
+            else:
+                self._held.pop(shard, None)
+        if acquired and not had:
+            LEASE_TRANSITIONS.labels(change="acquired").inc()
+            print(f"👑 {self.identity} now holds {self._shard_name(shard)}", flush=True)
+        elif had and not acquired:
+            LEASE_TRANSITIONS.labels(change="lost").inc()
+            print(f"👋 {self.identity} no longer holds {self._shard_name(shard)}", flush=True)
+
+    def _heartbeat(self, lease, now):
+        if lease is None:
+            self._create(self._member_name(), "member", now)
+        else:
+            self._renew(lease, now)
+
+    def _renew(self, lease, now):
+        lease.spec.renew_time = _micro(now)
+        lease.spec.lease_duration_seconds = self.lease_duration
+        return self._replace(lease)
+
+    def _create(self, lease_name, role, now):
+        body = client.V1Lease(
+            metadata=client.V1ObjectMeta(name=lease_name, labels={GROUP_LABEL: self.name, ROLE_LABEL: role}),
+            spec=client.V1LeaseSpec(
+                holder_identity=self.identity,
+                lease_duration_seconds=self.lease_duration,
+                acquire_time=_micro(now),
+                renew_time=_micro(now),
+                lease_transitions=0,
+            ),
+        )
+        try:
+            self.api.create_namespaced_lease(namespace=self.namespace, body=body)
+            return True
+        except ApiException as e:
+            if e.status == 409:  # another replica created it first
+                return False
+            raise
+
+    def _replace(self, lease):
+        # The Lease carries its resourceVersion, so a concurrent write by
+        # another replica makes this fail with 409 instead of overwriting it.
+        try:
+            self.api.replace_namespaced_lease(name=lease.metadata.name, namespace=self.namespace, body=lease)
+            return True
+        except ApiException as e:
+            if e.status in (404, 409):
+                return False
+            raise
+
+    def _delete(self, lease):
+        try:
+            self.api.delete_namespaced_lease(name=lease.metadata.name, namespace=self.namespace)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+
+    def _list(self):
+        return self.api.list_namespaced_lease(namespace=self.namespace, label_selector=f"{GROUP_LABEL}={self.name}").items
+
+    def _expired(self, lease, now):
+        renewed = lease.spec.renew_time or lease.spec.acquire_time
+        if renewed is None:
+            return True
+        return renewed.timestamp() + (lease.spec.lease_duration_seconds or self.lease_duration) <= now
+
+    def _shard_name(self, shard):
+        return self.name if self.shards == 1 else f"{self.name}-shard-{shard}"
+
+    def _member_name(self):
+        return f"{self.name}-member-{self.identity}"
+
+    def _export(self):
+        held = len(self.held())
+        SHARDS_HELD.set(held)
+        IS_LEADER.set(1 if held else 0)
+
+
+def _micro(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
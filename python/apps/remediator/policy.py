@@ -0,0 +1,140 @@
+"""Decides whether a reported job may be remediated right now.
+
+Every detection source reports a down job again and again (each poll, each
+alert repeat), so without a gate a slow-starting Deployment is restarted again
+before it ever becomes ready. A remediation is allowed only if:
+
+1. the job is outside its cooldown window. The window doubles with each
+   consecutive remediation that did not fix the job, up to `max_backoff`;
+2. the Deployment is not still rolling out (generation not yet observed, or
+   readyReplicas below spec.replicas while the rollout is still progressing);
+3. the cluster-wide token bucket has a token left.
+
+The clock is injectable so the policy can be driven by a simulated clock.
+"""
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+
+DECISION_COUNTER = Counter('remediator_policy_decisions_total', 'Remediation policy decisions', ['job', 'decision'])
+BACKOFF_SECONDS = Gauge('remediator_policy_backoff_seconds', 'Current cooldown window per job', ['job'])
+TOKENS = Gauge('remediator_policy_tokens', 'Tokens left in the cluster-wide remediation bucket')
+
+ALLOW = "allowed"
+COOLDOWN = "cooldown"
+BACKOFF = "backoff"
+ROLLOUT = "rollout_in_progress"
+RATE_LIMITED = "rate_limited"
+
+
+class TokenBucket:
+    """Allows `burst` actions at once, refilled at `rate` tokens per second."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+        self._lock = threading.Lock()
+        TOKENS.set(self.tokens)
+
+    def take(self):
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            allowed = self.tokens >= 1
+            if allowed:
+                self.tokens -= 1
+            TOKENS.set(self.tokens)
+            return allowed
+
+
+def replica_counts(workload):
+    """(desired, ready) for Deployments and StatefulSets (spec.replicas / readyReplicas)
+    and DaemonSets (desiredNumberScheduled / numberReady)."""
+    status = workload.status
+    desired = getattr(workload.spec, "replicas", None)
+    if desired is None:
+        return status.desired_number_scheduled, status.number_ready
+    return desired, status.ready_replicas
+
+
+def rollout_in_progress(workload):
+    """True while the controller is still working towards the desired replica count."""
+    status = workload.status
+    if (status.observed_generation or 0) < (workload.metadata.generation or 0):
+        return True
+    desired, ready = replica_counts(workload)
+    if (ready or 0) >= (desired or 0):
+        return False
+    for condition in getattr(status, "conditions", None) or []:
+        if condition.type == "Progressing":
+            # ProgressDeadlineExceeded (status False) means it is stuck: act on it
+            return condition.status == "True" and condition.reason != "NewReplicaSetAvailable"
+    return False
+
+
+class RemediationPolicy:
+    """Per-job cooldown with exponential backoff, rollout check and a cluster-wide token bucket.
+
+    `read_deployment(job)` returns the live workload object (or raises); pass
+    None to skip the rollout check. `rate` is in remediations per second; None
+    disables the token bucket.
+    """
+
+    def __init__(self, read_deployment=None, cooldown=120, max_backoff=1800, reset_after=900,
+                 rate=0.1, burst=3, clock=time.monotonic):
+        self.read_deployment = read_deployment
+        self.cooldown = cooldown
+        self.max_backoff = max_backoff
+        self.reset_after = reset_after
+        self.clock = clock
+        self.bucket = TokenBucket(rate, burst, clock) if rate else None
+        self._last_action = {}   # job -> clock() of the last remediation
+        self._streak = {}        # job -> remediations since the job was last healthy
+        self._lock = threading.Lock()
+
+    def window(self, job):
+        """Seconds that must pass after the last remediation of `job`."""
+        streak = self._streak.get(job, 0)
+        if not streak:
+            return 0
+        return min(self.max_backoff, self.cooldown * 2 ** (streak - 1))
+
+    def check(self, job):
+        """Return (allowed, decision) and count the decision; an allowed check takes a token."""
+        decision = self._decide(job)
+        DECISION_COUNTER.labels(job=str(job), decision=decision).inc()
+        return decision == ALLOW, decision
+
+    def record(self, job):
+        """Note a successful remediation; the next one waits longer."""
+        with self._lock:
+            self._last_action[job] = self.clock()
+            self._streak[job] = self._streak.get(job, 0) + 1
+            BACKOFF_SECONDS.labels(job=str(job)).set(self.window(job))
+
+    def _decide(self, job):
+        with self._lock:
+            now = self.clock()
+            last = self._last_action.get(job)
+            if last is not None and now - last >= self.window(job) + self.reset_after:
+                # Quiet for long enough after its last restart: treat as a new incident
+                self._streak.pop(job, None)
+                BACKOFF_SECONDS.labels(job=str(job)).set(0)
+            elif last is not None and now - last < self.window(job):
+                return BACKOFF if self._streak.get(job, 0) > 1 else COOLDOWN
+
+        if self.read_deployment is not None:
+            try:
+                if rollout_in_progress(self.read_deployment(job)):
+                    return ROLLOUT
+            except Exception as e:
+                print(f"⚠️ Could not read rollout status for {job}: {e}", flush=True)
+
+        if self.bucket is not None and not self.bucket.take():
+            return RATE_LIMITED
+        return ALLOW
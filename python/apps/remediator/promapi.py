@@ -0,0 +1,152 @@
+"""Prometheus HTTP API client for the remediator.
+
+One pooled requests.Session is shared by every query. Each attempt has
+connect/read timeouts; transient failures (connection errors, timeouts, 429 and
+5xx) are retried with jittered exponential backoff, and a circuit breaker stops
+querying a Prometheus that keeps failing so the caller falls back to the other
+detection sources instead of blocking on it.
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge, Histogram
+
+QUERY_SECONDS = Histogram(
+    'remediator_prometheus_query_seconds', 'Latency of Prometheus API queries, retries included', ['outcome'],
+    buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30),
+)
+RETRY_COUNTER = Counter('remediator_prometheus_retries_total', 'Prometheus query attempts that were retried')
+BREAKER_STATE = Gauge('remediator_prometheus_breaker_open', '1 while the Prometheus circuit breaker is open')
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PrometheusError(Exception):
+    pass
+
+
+class CircuitOpen(PrometheusError):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_timeout`
+    seconds lets a single trial call through (half-open) and closes again if it succeeds."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False  # open, or a half-open trial is already running
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+        BREAKER_STATE.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                BREAKER_STATE.set(1)
+
+
+class PrometheusClient:
+    """Runs instant queries against `url` (the /api/v1/query endpoint)."""
+
+    def __init__(self, url, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.5,
+                 max_backoff=5.0, breaker=None, session=None, sleep=time.sleep, pool_size=4):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def query(self, expr):
+        """Return the `data.result` list for `expr`.
+
+        Raises CircuitOpen without touching the network while the breaker is
+        open, and PrometheusError once the retries are used up.
+        """
+        if not self.breaker.allow():
+            QUERY_SECONDS.labels(outcome="rejected").observe(0)
+            raise CircuitOpen("Prometheus circuit breaker is open")
+
+        start = time.monotonic()
+        try:
+            result = self._query_with_retries(expr)
+        except Exception:
+            # Any failure counts, or a failed half-open probe would leave the breaker stuck
+            self.breaker.record_failure()
+            QUERY_SECONDS.labels(outcome="error").observe(time.monotonic() - start)
+            raise
+        self.breaker.record_success()
+        QUERY_SECONDS.labels(outcome="success").observe(time.monotonic() - start)
+        return result
+
+    def close(self):
+        self.session.close()
+
+    def _query_with_retries(self, expr):
+        attempt = 0
+        while True:
+            try:
+                return self._query_once(expr)
+            except _Retryable as e:
+                if attempt >= self.retries:
+                    raise PrometheusError(str(e)) from e
+                RETRY_COUNTER.inc()
+                self.sleep(self._delay(attempt))
+                attempt += 1
+
+    def _query_once(self, expr):
+        try:
+            resp = self.session.get(self.url, params={"query": expr}, timeout=self.timeout)
+        except requests.RequestException as e:  # connection, timeout, broken chunked body...
+            raise _Retryable(e) from e
+        if resp.status_code in RETRY_STATUSES:
+            raise _Retryable(f"HTTP {resp.status_code} from Prometheus")
+        try:
+            resp.raise_for_status()
+            data = resp.json()
+        except (requests.HTTPError, ValueError) as e:
+            raise PrometheusError(str(e)) from e
+        if data.get("status") != "success":
+            raise PrometheusError(f"query status {data.get('status')}: {data.get('error')}")
+        return data.get("data", {}).get("result", [])
+
+    def _delay(self, attempt):
+        # "Full jitter": spreads retries out so restarted pollers don't retry in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class _Retryable(Exception):
+    pass
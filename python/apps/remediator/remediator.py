@@ -1,16 +1,19 @@
-from prometheus_client import Counter, start_http_server, generate_latest
-import requests
-import subprocess
+from common.metrics import start_http_server
+from prometheus_client import Counter
+import os
+import signal
+import socket
 import time
 from kubernetes import client, config
 import sys
 
-try:
-    config.load_incluster_config()
-    apps_v1 = client.AppsV1Api()
-except Exception as e:
-    print(f"❌ Failed to initialize Kubernetes client: {e}", flush=True)
-    sys.exit(1)  # or retry loop if you want
+from actions import Clients, RecoveryTracker, execute, load_rules, read_workload
+from detect import AlertmanagerWebhook, DeploymentWatcher
+from engine import RemediationEngine
+from leader import LeaseElector
+from policy import RemediationPolicy
+from promapi import CircuitBreaker, CircuitOpen, PrometheusClient, PrometheusError
+from targets import TargetResolver
 
 # Prometheus metrics
 RESTART_COUNTER = Counter('remediator_restart_total', 'Total successful remediations', ['job'])
@@ -27,52 +30,168 @@ CHECK_COUNTER.inc(0)
 # PROMETHEUS_URL = "http://monitoring-kube-prometheus-prometheus.monitoring.svc.cluster.local:9090/api/v1/query"
 PROMETHEUS_URL = "http://monitoring-kube-prometheus-prometheus.monitoring.svc:9090/api/v1/query"
 
+# A slow or dead Prometheus must not stall the check loop: every query is bounded
+# by these timeouts, and after PROMETHEUS_BREAKER_FAILURES failed checks in a row
+# the loop stops asking for PROMETHEUS_BREAKER_RESET seconds.
+prometheus = PrometheusClient(
+    PROMETHEUS_URL,
+    connect_timeout=float(os.environ.get("PROMETHEUS_CONNECT_TIMEOUT", "2")),
+    read_timeout=float(os.environ.get("PROMETHEUS_READ_TIMEOUT", "5")),
+    retries=int(os.environ.get("PROMETHEUS_RETRIES", "2")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get("PROMETHEUS_BREAKER_FAILURES", "3")),
+        reset_timeout=float(os.environ.get("PROMETHEUS_BREAKER_RESET", "30")),
+    ),
+)
 
-# Initialize Kubernetes client (auto in-cluster)
-config.load_incluster_config()
-apps_v1 = client.AppsV1Api()
+# Polling is the fallback; the webhook and the Deployment watch catch failures first
+CHECK_INTERVAL = int(os.environ.get("CHECK_INTERVAL", "60"))
+# Series without a namespace label are looked up here
+NAMESPACE = os.environ.get("NAMESPACE", "default")
+# Comma-separated namespaces to watch and remediate; empty means the whole cluster
+NAMESPACES = [ns.strip() for ns in os.environ.get("NAMESPACES", "").split(",") if ns.strip()] or None
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8002"))
+WATCH_DEPLOYMENTS = os.environ.get("WATCH_DEPLOYMENTS", "true") == "true"
+REMEDIATION_CONCURRENCY = int(os.environ.get("REMEDIATION_CONCURRENCY", "8"))
+# Several replicas may run: each only remediates targets in the shards whose
+# Lease it holds. One shard = plain leader election (active/standby).
+LEADER_ELECTION = os.environ.get("LEADER_ELECTION", "true") == "true"
+REMEDIATION_SHARDS = int(os.environ.get("REMEDIATION_SHARDS", "1"))
+LEASE_DURATION = int(os.environ.get("LEASE_DURATION", "15"))
+LEASE_RENEW_PERIOD = float(os.environ.get("LEASE_RENEW_PERIOD", "5"))
+POD_NAME = os.environ.get("POD_NAME", socket.gethostname())
+POD_NAMESPACE = os.environ.get("POD_NAMESPACE", NAMESPACE)
 
+apps_v1 = None
+core_v1 = None
+coordination_v1 = None
+resolver = None
+engine = None
+elector = None
+tracker = None
 
-def get_failed_targets():
-    CHECK_COUNTER.inc()
-    try:
-        resp = requests.get(PROMETHEUS_URL, params={"query": "up == 0 and job != remediator" })
-        resp.raise_for_status()  # Raise HTTPError for bad responses
-        json_data = resp.json()
+# Which action fixes which failure: delete just the failing pod, raise a memory
+# limit after an OOM kill, scale out on latency... rollout restart as the last resort
+RULES = load_rules(os.environ.get("REMEDIATION_RULES_FILE"))
 
-        if json_data.get("status") != "success":
-            print(f"❌ Prometheus query status: {json_data.get('status')}", flush=True)
-            return []
+# Restart-storm protection: per-job cooldown doubling on every restart that did
+# not help, no restart while a rollout is still progressing, and at most
+# REMEDIATION_BURST restarts at once across the cluster, refilled at
+# REMEDIATION_RATE_PER_MIN.
+policy = RemediationPolicy(
+    read_deployment=lambda target: read_workload(Clients(apps_v1, core_v1), target),
+    cooldown=float(os.environ.get("REMEDIATION_COOLDOWN", "120")),
+    max_backoff=float(os.environ.get("REMEDIATION_MAX_BACKOFF", "1800")),
+    rate=float(os.environ.get("REMEDIATION_RATE_PER_MIN", "6")) / 60,
+    burst=int(os.environ.get("REMEDIATION_BURST", "3")),
+)
 
-        results = json_data.get("data", {}).get("result", [])
-        return [r["metric"]["job"] for r in results]
 
+def init_kubernetes():
+    # Initialize Kubernetes client (auto in-cluster)
+    global apps_v1, core_v1, coordination_v1
+    try:
+        config.load_incluster_config()
+        apps_v1 = client.AppsV1Api()
+        core_v1 = client.CoreV1Api()
+        coordination_v1 = client.CoordinationV1Api()
     except Exception as e:
+        print(f"❌ Failed to initialize Kubernetes client: {e}", flush=True)
+        sys.exit(1)  # or retry loop if you want
+
+
+def get_failed_targets():
+    CHECK_COUNTER.inc()
+    try:
+        results = prometheus.query('up{job!="remediator"} == 0')
+        return [r["metric"] for r in results]
+
+    except CircuitOpen:
+        print("⏸️ Prometheus circuit open, skipping this check", flush=True)
+        return []
+    except PrometheusError as e:
         print(f"❌ Prometheus query failed: {e}", flush=True)
-        # print(f"❌ Full Prometheus response: {resp.text}", flush=True)
         return []
+    except Exception as e:
+        print(f"❌ Error querying Prometheus: {e}", flush=True)
+        return []
+
+def report(labels):
+    """Queue the workload behind a failed series' labels for remediation."""
+    target = resolver.resolve(labels)
+    if target is None:
+        print(f"❓ No workload found for {labels.get('job')} ({labels.get('namespace', NAMESPACE)})", flush=True)
+        return None
+    return submit(target, labels)
 
-def remediate(job):
-    print(f"🛠️ Restarting deployment for: {job}", flush=True)
+def submit(target, labels=None):
+    """Queue `target` if this replica owns it; returns False (and drops it) if it doesn't."""
+    if elector is not None and not elector.owns(target):
+        return False
+    return engine.submit(target, labels or {})
+
+def remediate(target, labels=None):
+    if elector is not None and not elector.owns(target):
+        print(f"👋 Lost the lease for {target} before restarting it, leaving it to the new owner", flush=True)
+        return
+    allowed, decision = policy.check(target)
+    if not allowed:
+        print(f"⏳ Not restarting {target}: {decision}", flush=True)
+        return
     try:
-        apps_v1.patch_namespaced_deployment(
-            name=job,
-            namespace="default",
-            body={"spec": {"template": {"metadata": {"annotations": {"restarted-at": str(time.time())}}}}}
-        )
-        RESTART_COUNTER.labels(job=job).inc()
+        action = execute(Clients(apps_v1, core_v1), target, labels or {}, RULES)
+        print(f"🛠️ Remediated {target} with {action}", flush=True)
+        RESTART_COUNTER.labels(job=str(target)).inc()
+        if tracker is not None:
+            tracker.track(target, action)
     except Exception as e:
-        print(f"❌ Failed to restart {job}: {e}", flush=True)
-        FAILURE_COUNTER.labels(job=job).inc()
+        # Not recorded: a failed attempt changed nothing, so it must not
+        # start a cooldown that suppresses the next alert
+        print(f"❌ Failed to remediate {target}: {e}", flush=True)
+        FAILURE_COUNTER.labels(job=str(target)).inc()
+        return
+    policy.record(target)
 
 if __name__ == "__main__":
+    init_kubernetes()
     print("🚀 Remediator started. Exposing /metrics on port 8001...", flush=True)
     # start_http_server(8001)  # Serve metrics on :8001
     start_http_server(8001, addr="0.0.0.0")
 
-    while True:
-        print("🔍 Checking Prometheus for failed targets...", flush=True)
-        failed = get_failed_targets()
-        for job in failed:
-            remediate(job)
-        time.sleep(60)
+    # Series labels -> owning workload, served from watched pods/ReplicaSets/Services
+    scope = ", ".join(NAMESPACES) if NAMESPACES else "all namespaces"
+    resolver = TargetResolver(core_v1, apps_v1, namespaces=NAMESPACES, default_namespace=NAMESPACE).start()
+    if not resolver.wait_synced(timeout=30):
+        print("⚠️ Target cache not synced after 30s, continuing", flush=True)
+    print(f"🗺️ Resolving targets in {scope}", flush=True)
+
+    if LEADER_ELECTION:
+        elector = LeaseElector(
+            coordination_v1, POD_NAME, namespace=POD_NAMESPACE, shards=REMEDIATION_SHARDS,
+            lease_duration=LEASE_DURATION, renew_period=LEASE_RENEW_PERIOD,
+        ).start()
+        # Hand the Leases back on SIGTERM so another replica takes over at once
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        print(f"🗳️ Leader election on as {POD_NAME} ({REMEDIATION_SHARDS} shard(s))", flush=True)
+
+    tracker = RecoveryTracker(lambda target: read_workload(Clients(apps_v1, core_v1), target)).start()
+
+    # Failed workloads are patched in parallel; one still being patched is not
+    # resubmitted by the next check.
+    engine = RemediationEngine(remediate, max_workers=REMEDIATION_CONCURRENCY)
+
+    AlertmanagerWebhook(report, port=WEBHOOK_PORT).start()
+    print(f"🔔 Listening for Alertmanager webhooks on :{WEBHOOK_PORT}/alerts", flush=True)
+    if WATCH_DEPLOYMENTS:
+        DeploymentWatcher(apps_v1, submit, namespaces=NAMESPACES).start()
+        print(f"👀 Watching Deployments in {scope}", flush=True)
+
+    try:
+        while True:
+            print("🔍 Checking Prometheus for failed targets...", flush=True)
+            for labels in get_failed_targets():
+                report(labels)
+            time.sleep(CHECK_INTERVAL)
+    finally:
+        if elector is not None:
+            elector.stop()
@@ -0,0 +1,451 @@
+"""Offline replay of failures through the remediator's real code.
+
+A discrete-event simulation: a fake clock jumps from event to event, so
+thousands of simulated hours run in seconds. The simulated cluster stands in
+for Prometheus (`up`), the AppsV1/CoreV1 APIs and Alertmanager. Everything
+else is the remediator itself:
+
+    detection:    remediator.get_failed_targets (poll), DeploymentWatcher.handle (watch),
+                  remediator.report (what the Alertmanager webhook calls)
+    remediation:  TargetResolver, RemediationEngine (inline executor),
+                  RemediationPolicy, the action rules, RecoveryTracker
+
+Failure kinds:
+    crash       stays down until something restarts it
+    transient   heals by itself after a minute or two; a restart also fixes it
+    persistent  a restart does not help (bad config, dependency down); ends on its own
+
+Each workload needs `--startup` seconds to become ready after a restart, and a
+restart while it is still starting begins that wait again. That is how restart
+storms stretch outages.
+
+Usage (from the repo root):
+    PYTHONPATH=python/apps python python/apps/remediator/simulator.py --hours 5000
+    PYTHONPATH=python/apps python python/apps/remediator/simulator.py --policies naive,default --storm-every 24
+    PYTHONPATH=python/apps python python/apps/remediator/simulator.py --trace up_range.json
+
+--trace takes the JSON of a Prometheus range query for `up`
+(/api/v1/query_range?query=up&step=15s). Every run of zeros is replayed as a
+fault that a restart fixes, ending on its own where the recording came back up.
+
+Synthetic traces come from --seed (default 1), so the same arguments always
+give the same figures; only wall_s varies.
+"""
+import argparse
+import contextlib
+import heapq
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace as NS
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import remediator  # noqa: E402
+from actions import RecoveryTracker, load_rules  # noqa: E402
+from detect import DeploymentWatcher  # noqa: E402
+from engine import RemediationEngine  # noqa: E402
+from fakes import InlineExecutor  # noqa: E402
+from policy import RemediationPolicy  # noqa: E402
+from targets import TargetResolver  # noqa: E402
+
+NAMESPACE = "default"
+
+# name -> RemediationPolicy kwargs (besides read_deployment/clock).
+# "naive" is the remediator before the policy layer: restart on every report.
+POLICIES = {
+    "naive": dict(cooldown=0, rate=None, rollout_check=False),
+    "default": dict(cooldown=120, max_backoff=1800, rate=6 / 60, burst=3),
+    "conservative": dict(cooldown=300, max_backoff=3600, rate=2 / 60, burst=2),
+}
+
+
+class Fault:
+    def __init__(self, kind, start, end=None):
+        self.kind = kind
+        self.start = start
+        self.end = end  # None: only a restart ends it
+
+    @property
+    def fixable(self):
+        return self.kind != "persistent"
+
+
+class Simulation:
+    """The fake cluster, the event queue and the remediator wired to them."""
+
+    def __init__(self, workloads, policy, sources=("poll", "watch", "alerts"), check_interval=60,
+                 startup=30, alert_for=10, alert_repeat=300, tracker_interval=5):
+        self.now = 0.0
+        self.sources = set(sources)
+        self.check_interval = check_interval
+        self.startup = startup
+        self.alert_for = alert_for
+        self.alert_repeat = alert_repeat
+        self.tracker_interval = tracker_interval
+        self._events = []
+        self._seq = 0
+        self.calls = Counter()
+        self.actions = Counter()
+        self.wasted = 0
+        self.outages = []  # seconds from going down to being up again
+        self.workloads = {name: SimWorkload(self, name) for name in workloads}
+
+        settings = dict(POLICIES[policy])
+        rollout_check = settings.pop("rollout_check", True)
+        self.policy = RemediationPolicy(
+            read_deployment=self.read if rollout_check else None, clock=self.clock, **settings
+        )
+        self.tracker = RecoveryTracker(self.read, interval=tracker_interval, clock=self.clock)
+        self.watcher = DeploymentWatcher(None, remediator.submit, grace=0)
+        self._tracker_scheduled = False
+        self._install()
+
+    # -- wiring ---------------------------------------------------------------
+
+    def _install(self):
+        """Point the remediator module at the simulated cluster."""
+        remediator.apps_v1 = SimAppsV1Api(self)
+        remediator.core_v1 = SimCoreV1Api(self)
+        remediator.prometheus = SimPrometheus(self)
+        remediator.policy = self.policy
+        remediator.tracker = self.tracker
+        remediator.elector = None
+        remediator.RULES = load_rules()
+        remediator.engine = RemediationEngine(remediator.remediate, executor=InlineExecutor())
+        pods, replicasets, services = [], [], []
+        for w in self.workloads.values():
+            pods.append(_obj(w.pod, labels={"app": w.name}, owner=("ReplicaSet", f"{w.name}-rs")))
+            replicasets.append(_obj(f"{w.name}-rs", owner=("Deployment", w.name)))
+            services.append(NS(metadata=_meta(f"{w.name}-service"), spec=NS(selector={"app": w.name})))
+        remediator.resolver = TargetResolver(default_namespace=NAMESPACE).load(pods, replicasets, services)
+
+    def clock(self):
+        return self.now
+
+    def read(self, target):
+        self.calls["read_namespaced_deployment"] += 1
+        return self.workloads[target.name].deployment()
+
+    # -- event queue -----------------------------------------------------------
+
+    def at(self, when, fn, *args):
+        self._seq += 1
+        heapq.heappush(self._events, (when, self._seq, fn, args))
+
+    def run(self, until):
+        if "poll" in self.sources:
+            self.at(0, self._poll)
+        while self._events and self._events[0][0] <= until:
+            self.now, _, fn, args = heapq.heappop(self._events)
+            fn(*args)
+        self.now = until
+        for w in self.workloads.values():
+            if not w.up:
+                self.outages.append(until - w.down_since)  # still down at the end
+
+    def _poll(self):
+        for labels in remediator.get_failed_targets():
+            remediator.report(labels)
+        self._after_remediation()
+        self.at(self.now + self.check_interval, self._poll)
+
+    def _alert(self, w, outage):
+        if w.outage != outage or w.up:
+            return
+        labels = dict(w.labels(), alertname="KubeLabTargetDown")
+        remediator.report(labels)
+        self._after_remediation()
+        self.at(self.now + self.alert_repeat, self._alert, w, outage)
+
+    def _track(self):
+        self.tracker.poll()
+        self._tracker_scheduled = False
+        self._after_remediation()
+
+    def _after_remediation(self):
+        if self.tracker.pending() and not self._tracker_scheduled:
+            self._tracker_scheduled = True
+            self.at(self.now + self.tracker_interval, self._track)
+
+    # -- workload state changes --------------------------------------------------
+
+    def down(self, w):
+        """`w` just went down: the watch sees it now, Alertmanager after `for:`."""
+        if "watch" in self.sources:
+            self.watcher.handle("MODIFIED", w.deployment())
+            self._after_remediation()
+        if "alerts" in self.sources:
+            self.at(self.now + self.alert_for, self._alert, w, w.outage)
+
+    def recovered(self, w):
+        if "watch" in self.sources:
+            self.watcher.handle("MODIFIED", w.deployment())
+
+
+class SimWorkload:
+    """A single-replica Deployment with at most one active fault."""
+
+    def __init__(self, sim, name):
+        self.sim = sim
+        self.name = name
+        self.pod = f"{name}-0"
+        self.fault = None
+        self.ready_at = 0.0
+        self.generation = 1
+        self.restarts = 0
+        self.up = True
+        self.down_since = None
+        self.outage = 0
+
+    def labels(self):
+        return {"job": f"{self.name}-service", "namespace": NAMESPACE, "pod": self.pod,
+                "service": f"{self.name}-service"}
+
+    def deployment(self):
+        ready = 1 if self._healthy() else 0
+        starting = self.ready_at > self.sim.now
+        return NS(
+            metadata=NS(name=self.name, namespace=NAMESPACE, generation=self.generation, creation_timestamp=None),
+            spec=NS(replicas=1),
+            status=NS(
+                observed_generation=self.generation, ready_replicas=ready, available_replicas=ready,
+                conditions=[NS(type="Progressing", status="True",
+                               reason="ReplicaSetUpdated" if starting else "NewReplicaSetAvailable")],
+            ),
+        )
+
+    def inject(self, fault):
+        if self.fault is not None:
+            return  # already failing; overlapping faults are dropped
+        self.fault = fault
+        if fault.end is not None:
+            self.sim.at(fault.end, self._heal, fault)
+        self._update()
+
+    def restart(self):
+        sim = self.sim
+        self.restarts += 1
+        if self.ready_at > sim.now or (self.fault and not self.fault.fixable) or (self.up and not self.fault):
+            sim.wasted += 1  # restarting something already restarting, unfixable, or healthy
+        if self.fault and self.fault.fixable:
+            self.fault = None
+        self.generation += 1
+        self.ready_at = sim.now + sim.startup
+        sim.at(self.ready_at, self._update)
+        self._update()
+
+    def _heal(self, fault):
+        if self.fault is fault:
+            self.fault = None
+            self._update()
+
+    def _healthy(self):
+        return self.fault is None and self.ready_at <= self.sim.now
+
+    def _update(self):
+        healthy = self._healthy()
+        if healthy == self.up:
+            return
+        self.up = healthy
+        if healthy:
+            self.sim.outages.append(self.sim.now - self.down_since)
+            self.sim.recovered(self)
+        else:
+            self.down_since = self.sim.now
+            self.outage += 1
+            self.sim.down(self)
+
+
+class SimAppsV1Api:
+    def __init__(self, sim):
+        self.sim = sim
+
+    def read_namespaced_deployment(self, name, namespace):
+        self.sim.calls["read_namespaced_deployment"] += 1
+        return self.sim.workloads[name].deployment()
+
+    def patch_namespaced_deployment(self, name, namespace, body):
+        self.sim.calls["patch_namespaced_deployment"] += 1
+        self.sim.actions["rollout_restart" if "metadata" in body["spec"]["template"] else "raise_limit"] += 1
+        w = self.sim.workloads[name]
+        w.restart()
+        return w.deployment()
+
+    def read_namespaced_deployment_scale(self, name, namespace):
+        self.sim.calls["read_namespaced_deployment_scale"] += 1
+        return NS(spec=NS(replicas=1))
+
+    def patch_namespaced_deployment_scale(self, name, namespace, body):
+        self.sim.calls["patch_namespaced_deployment_scale"] += 1
+        self.sim.actions["scale_out"] += 1
+
+
+class SimCoreV1Api:
+    def __init__(self, sim):
+        self.sim = sim
+
+    def delete_namespaced_pod(self, name, namespace):
+        self.sim.calls["delete_namespaced_pod"] += 1
+        self.sim.actions["delete_pod"] += 1
+        self.sim.workloads[name.rsplit("-", 1)[0]].restart()
+
+
+class SimPrometheus:
+    """Answers the remediator's `up == 0` query from the simulated cluster."""
+
+    def __init__(self, sim):
+        self.sim = sim
+
+    def query(self, expr):
+        self.sim.calls["prometheus_query"] += 1
+        return [{"metric": w.labels()} for w in self.sim.workloads.values() if not w.up]
+
+
+def _meta(name, labels=None, owner=None):
+    refs = [NS(controller=True, kind=owner[0], name=owner[1])] if owner else None
+    return NS(name=name, namespace=NAMESPACE, labels=labels, owner_references=refs)
+
+
+def _obj(name, labels=None, owner=None):
+    return NS(metadata=_meta(name, labels, owner))
+
+
+# -- traces -------------------------------------------------------------------
+
+def synthetic_trace(workloads, hours, mtbf_hours, storm_every, storm_size, seed):
+    """[(time, workload, Fault)]: independent failures per workload plus periodic storms."""
+    rng = random.Random(seed)
+    horizon = hours * 3600
+    trace = []
+
+    def fault(start):
+        kind = rng.choices(("crash", "transient", "persistent"), weights=(70, 20, 10))[0]
+        end = {
+            "crash": None,
+            "transient": start + rng.uniform(60, 180),
+            "persistent": start + rng.uniform(300, 3600),
+        }[kind]
+        return Fault(kind, start, end)
+
+    for name in workloads:
+        t = rng.expovariate(1 / (mtbf_hours * 3600))
+        while t < horizon:
+            trace.append((t, name, fault(t)))
+            t += rng.expovariate(1 / (mtbf_hours * 3600))
+    if storm_every:
+        t = storm_every * 3600
+        while t < horizon:
+            for name in rng.sample(workloads, min(storm_size, len(workloads))):
+                trace.append((t, name, Fault("crash", t)))
+            t += storm_every * 3600
+    return sorted(trace, key=lambda item: item[0])
+
+
+def recorded_trace(path):
+    """([workloads], [(time, workload, Fault)], hours) from a Prometheus `up` range query."""
+    with open(path) as f:
+        data = json.load(f)
+    result = data.get("data", data).get("result", [])
+    trace, names, first, last = [], set(), None, None
+    for series in result:
+        metric = series["metric"]
+        name = metric.get("pod", metric.get("job", "unknown")).rsplit("-", 2)[0]
+        names.add(name)
+        down_since = None
+        for ts, value in series["values"]:
+            ts = float(ts)
+            first = ts if first is None else min(first, ts)
+            last = ts if last is None else max(last, ts)
+            if value == "0" and down_since is None:
+                down_since = ts
+            elif value != "0" and down_since is not None:
+                trace.append((down_since, name, Fault("recorded", down_since, ts)))
+                down_since = None
+        if down_since is not None:
+            trace.append((down_since, name, Fault("recorded", down_since, last)))
+    trace = [(t - first, name, Fault(f.kind, f.start - first, f.end - first)) for t, name, f in sorted(trace, key=lambda x: x[0])]
+    return sorted(names), trace, ((last or 0) - (first or 0)) / 3600
+
+
+# -- driver -------------------------------------------------------------------
+
+def simulate(workloads, trace, hours, policy, **kwargs):
+    sim = Simulation(workloads, policy, **kwargs)
+    for t, name, fault in trace:
+        sim.at(t, sim.workloads[name].inject, fault)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # the remediator logs every decision
+        sim.run(hours * 3600)
+    sim.wall = time.perf_counter() - start
+    return sim
+
+
+def report(policy, sim, faults):
+    outages = sorted(sim.outages)
+    pct = lambda q: outages[min(len(outages) - 1, int(q * len(outages)))] if outages else 0  # noqa: E731
+    api = sum(n for call, n in sim.calls.items() if call != "prometheus_query")
+    return {
+        "policy": policy,
+        "faults": faults,
+        "outages": len(outages),
+        "mttr_s": round(statistics.fmean(outages), 1) if outages else 0,
+        "p50_s": round(pct(.5), 1),
+        "p95_s": round(pct(.95), 1),
+        "max_s": round(outages[-1], 1) if outages else 0,
+        "remediations": sum(sim.actions.values()),
+        "wasted": sim.wasted,
+        "k8s_api_calls": api,
+        "actions": dict(sim.actions),
+        "calls": dict(sim.calls),
+        "wall_s": round(sim.wall, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--policies", default="naive,default,conservative",
+                        help=f"comma-separated, from: {', '.join(POLICIES)}")
+    parser.add_argument("--sources", default="poll,watch,alerts", help="detection sources to enable")
+    parser.add_argument("--trace", help="Prometheus range query JSON for `up` to replay")
+    parser.add_argument("--hours", type=float, default=2000)
+    parser.add_argument("--workloads", type=int, default=20)
+    parser.add_argument("--mtbf", type=float, default=24, help="mean hours between failures per workload")
+    parser.add_argument("--storm-every", type=float, default=0, help="hours between correlated failure storms")
+    parser.add_argument("--storm-size", type=int, default=10)
+    parser.add_argument("--startup", type=float, default=30, help="seconds a workload needs to become ready")
+    parser.add_argument("--check-interval", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the full results as JSON")
+    args = parser.parse_args()
+
+    if args.trace:
+        workloads, trace, hours = recorded_trace(args.trace)
+    else:
+        workloads = [f"app-{i}" for i in range(args.workloads)]
+        trace = synthetic_trace(workloads, args.hours, args.mtbf, args.storm_every, args.storm_size, args.seed)
+        hours = args.hours
+
+    results = [
+        report(policy, simulate(workloads, trace, hours, policy, sources=args.sources.split(","),
+                                check_interval=args.check_interval, startup=args.startup), len(trace))
+        for policy in args.policies.split(",")
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    origin = args.trace or f"seed {args.seed}, storms {f'every {args.storm_every:g}h' if args.storm_every else 'off'}"
+    print(f"⏱️ {hours:.0f} simulated hours, {len(workloads)} workloads, {len(trace)} faults ({origin}), sources: {args.sources}")
+    columns = ("policy", "outages", "mttr_s", "p50_s", "p95_s", "max_s", "remediations", "wasted", "k8s_api_calls", "wall_s")
+    print("".join(f"{c:>14}" for c in columns))
+    for row in results:
+        print("".join(f"{row[c]:>14}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Maps Prometheus series labels to the workload that owns them.
+
+Prometheus reports targets by `job`, `namespace`, `service` and `pod`. What
+can be restarted is the Deployment, StatefulSet or DaemonSet that owns the
+pod. TargetResolver keeps pods, ReplicaSets and Services in memory, filled by
+list+watch informers. resolve() is then a few dict lookups and never calls the
+API server:
+
+    pod label     -> pod owner reference -> (ReplicaSet ->) workload
+    service / job -> Service selector -> a matching pod -> workload
+    job           -> a Deployment of that name (the old job == Deployment rule)
+
+Pods are also indexed by label, so a Service's pods are found from its
+selector's smallest posting set instead of a scan of the namespace.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from prometheus_client import Counter, Gauge
+
+RESOLVE_COUNTER = Counter('remediator_target_resolutions_total', 'Target lookups by the label that resolved them', ['via'])
+CACHE_OBJECTS = Gauge('remediator_target_cache_objects', 'Objects held by the target resolver cache', ['resource'])
+INFORMER_RESTARTS = Counter('remediator_informer_restarts_total', 'Informer watches restarted after an error', ['resource'])
+
+WORKLOAD_KINDS = ("Deployment", "StatefulSet", "DaemonSet")
+
+
+class Workload(namedtuple("Workload", "kind namespace name")):
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.namespace}/{self.name}"
+
+
+class Informer:
+    """Lists `resource` once, then follows a watch from the list's resourceVersion.
+
+    on_sync(items) gets the full list after every (re)list; on_event(type, obj)
+    gets each watch event. A watch that times out or fails is resumed from the
+    last resourceVersion seen (bookmarks keep it fresh); only a 410 Gone, when
+    that version has expired, triggers a relist.
+    """
+
+    def __init__(self, resource, list_fn, on_sync, on_event, **kwargs):
+        self.resource = resource
+        self.list_fn = list_fn
+        self.on_sync = on_sync
+        self.on_event = on_event
+        self.kwargs = kwargs
+        self.synced = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, name=f"informer-{self.resource}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        resource_version = None
+        while not self._stopped.is_set():
+            w = watch.Watch()
+            try:
+                if resource_version is None:
+                    listing = self.list_fn(**self.kwargs)
+                    self.on_sync(listing.items)
+                    self.synced.set()
+                    resource_version = listing.metadata.resource_version
+                for event in w.stream(self.list_fn, resource_version=resource_version,
+                                      allow_watch_bookmarks=True, timeout_seconds=300, **self.kwargs):
+                    resource_version = event["object"].metadata.resource_version
+                    self.on_event(event["type"], event["object"])
+                    if self._stopped.is_set():
+                        return
+            except ApiException as e:
+                INFORMER_RESTARTS.labels(resource=self.resource).inc()
+                if e.status == 410:
+                    resource_version = None  # expired: relist
+                else:
+                    print(f"❌ {self.resource} informer failed: {e.reason}", flush=True)
+                    time.sleep(5)
+            except Exception as e:
+                INFORMER_RESTARTS.labels(resource=self.resource).inc()
+                print(f"❌ {self.resource} informer failed: {e}", flush=True)
+                time.sleep(5)
+            finally:
+                w.stop()
+
+
+def _owner(obj):
+    for ref in obj.metadata.owner_references or []:
+        if ref.controller:
+            return ref.kind, ref.name
+    return None
+
+
+class TargetResolver:
+    """Resolves series labels to a Workload from informer-fed caches.
+
+    `namespaces` limits the informers to those namespaces; None watches the
+    whole cluster. Labels without a `namespace` fall back to `default_namespace`.
+    """
+
+    def __init__(self, core_v1=None, apps_v1=None, namespaces=None, default_namespace="default"):
+        self.core_v1 = core_v1
+        self.apps_v1 = apps_v1
+        self.namespaces = namespaces
+        self.default_namespace = default_namespace
+        self._pods = {}        # (ns, name) -> (labels, (owner kind, owner name) or None)
+        self._pods_by_label = {}  # (ns, label, value) -> {pod name}
+        self._replicasets = {} # (ns, name) -> owning Deployment name or None
+        self._deployments = {} # (ns, name) -> number of ReplicaSets it owns
+        self._services = {}    # (ns, name) -> selector dict
+        self._lock = threading.Lock()
+        self._informers = []
+
+    # -- informers -----------------------------------------------------------
+
+    def start(self):
+        if self.namespaces:
+            for ns in self.namespaces:
+                self._add_informers(
+                    pods=(self.core_v1.list_namespaced_pod, {"namespace": ns}),
+                    replicasets=(self.apps_v1.list_namespaced_replica_set, {"namespace": ns}),
+                    services=(self.core_v1.list_namespaced_service, {"namespace": ns}),
+                    scope=ns,
+                )
+        else:
+            self._add_informers(
+                pods=(self.core_v1.list_pod_for_all_namespaces, {}),
+                replicasets=(self.apps_v1.list_replica_set_for_all_namespaces, {}),
+                services=(self.core_v1.list_service_for_all_namespaces, {}),
+                scope=None,
+            )
+        for informer in self._informers:
+            informer.start()
+        return self
+
+    def load(self, pods=(), replicasets=(), services=()):
+        """Fill the caches from object lists directly, without informers (offline runs)."""
+        for resource, items, put in (
+            ("pods", pods, self._put_pod),
+            ("replicasets", replicasets, self._put_replicaset),
+            ("services", services, self._put_service),
+        ):
+            self._syncer(resource, None, put)(items)
+        return self
+
+    def wait_synced(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for informer in self._informers:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not informer.synced.wait(remaining):
+                return False
+        return True
+
+    def _add_informers(self, pods, replicasets, services, scope):
+        for resource, (list_fn, kwargs), put, drop in (
+            ("pods", pods, self._put_pod, self._drop_pod),
+            ("replicasets", replicasets, self._put_replicaset, self._drop_replicaset),
+            ("services", services, self._put_service, self._drop_service),
+        ):
+            self._informers.append(Informer(
+                resource, list_fn,
+                on_sync=self._syncer(resource, scope, put),
+                on_event=self._handler(put, drop),
+                **kwargs,
+            ))
+
+    def _syncer(self, resource, scope, put):
+        def on_sync(items):
+            with self._lock:
+                cache = {"pods": self._pods, "replicasets": self._replicasets, "services": self._services}[resource]
+                for key in [k for k in cache if scope is None or k[0] == scope]:
+                    self._drop_locked(resource, key)
+                for obj in items:
+                    put(obj, locked=True)
+            self._export_sizes()
+        return on_sync
+
+    def _handler(self, put, drop):
+        def on_event(event_type, obj):
+            if event_type == "DELETED":
+                drop(obj)
+            elif event_type in ("ADDED", "MODIFIED"):
+                put(obj)
+        return on_event
+
+    # -- cache maintenance ---------------------------------------------------
+
+    def _put_pod(self, pod, locked=False):
+        key = (pod.metadata.namespace, pod.metadata.name)
+        entry = (dict(pod.metadata.labels or {}), _owner(pod))
+        with _maybe(self._lock, locked):
+            old = self._pods.get(key)
+            if old is not None:
+                self._unindex_pod(key, old[0])
+            self._pods[key] = entry
+            for label in entry[0].items():
+                self._pods_by_label.setdefault((key[0], *label), set()).add(key[1])
+
+    def _drop_pod(self, pod):
+        with self._lock:
+            self._drop_locked("pods", (pod.metadata.namespace, pod.metadata.name))
+
+    def _put_replicaset(self, rs, locked=False):
+        key = (rs.metadata.namespace, rs.metadata.name)
+        owner = _owner(rs)
+        deployment = owner[1] if owner and owner[0] == "Deployment" else None
+        with _maybe(self._lock, locked):
+            if key in self._replicasets:
+                self._unref_deployment(key[0], self._replicasets[key])
+            self._replicasets[key] = deployment
+            if deployment:
+                dkey = (key[0], deployment)
+                self._deployments[dkey] = self._deployments.get(dkey, 0) + 1
+
+    def _drop_replicaset(self, rs):
+        with self._lock:
+            self._drop_locked("replicasets", (rs.metadata.namespace, rs.metadata.name))
+
+    def _put_service(self, svc, locked=False):
+        key = (svc.metadata.namespace, svc.metadata.name)
+        with _maybe(self._lock, locked):
+            self._services[key] = dict(svc.spec.selector or {})
+
+    def _drop_service(self, svc):
+        with self._lock:
+            self._drop_locked("services", (svc.metadata.namespace, svc.metadata.name))
+
+    def _drop_locked(self, resource, key):
+        if resource == "pods":
+            entry = self._pods.pop(key, None)
+            if entry is not None:
+                self._unindex_pod(key, entry[0])
+        elif resource == "replicasets":
+            if key in self._replicasets:
+                self._unref_deployment(key[0], self._replicasets.pop(key))
+        else:
+            self._services.pop(key, None)
+
+    def _unindex_pod(self, key, labels):
+        for label in labels.items():
+            ikey = (key[0], *label)
+            names = self._pods_by_label.get(ikey)
+            if names is not None:
+                names.discard(key[1])
+                if not names:
+                    del self._pods_by_label[ikey]
+
+    def _unref_deployment(self, ns, deployment):
+        if not deployment:
+            return
+        dkey = (ns, deployment)
+        left = self._deployments.get(dkey, 0) - 1
+        if left > 0:
+            self._deployments[dkey] = left
+        else:
+            self._deployments.pop(dkey, None)
+
+    def _export_sizes(self):
+        CACHE_OBJECTS.labels(resource="pods").set(len(self._pods))
+        CACHE_OBJECTS.labels(resource="replicasets").set(len(self._replicasets))
+        CACHE_OBJECTS.labels(resource="services").set(len(self._services))
+
+    # -- lookups -------------------------------------------------------------
+
+    def resolve(self, labels):
+        """Return the Workload behind a series' labels, or None if it can't be found."""
+        ns = labels.get("namespace") or self.default_namespace
+        with self._lock:
+            for via, value, lookup in (
+                ("pod", labels.get("pod"), self._workload_for_pod),
+                ("service", labels.get("service"), self._workload_for_service),
+                ("job", labels.get("job"), self._workload_for_service),
+                ("deployment", labels.get("job"), self._known_deployment),
+            ):
+                if not value:
+                    continue
+                workload = lookup(ns, value)
+                if workload is not None:
+                    RESOLVE_COUNTER.labels(via=via).inc()
+                    return workload
+        RESOLVE_COUNTER.labels(via="unresolved").inc()
+        return None
+
+    def _workload_for_pod(self, ns, name):
+        entry = self._pods.get((ns, name))
+        if entry is None or entry[1] is None:
+            return None
+        kind, owner = entry[1]
+        if kind == "ReplicaSet":
+            deployment = self._replicasets.get((ns, owner))
+            return Workload("Deployment", ns, deployment) if deployment else None
+        if kind in WORKLOAD_KINDS:
+            return Workload(kind, ns, owner)
+        return None
+
+    def _workload_for_service(self, ns, name):
+        selector = self._services.get((ns, name))
+        if not selector:
+            return None
+        postings = [self._pods_by_label.get((ns, *label)) for label in selector.items()]
+        if not all(postings):
+            return None
+        # Pods of one workload share their labels, so the first candidate
+        # from the smallest set usually matches the whole selector
+        smallest = min(postings, key=len)
+        for pod in smallest:
+            if all(pod in names for names in postings if names is not smallest):
+                workload = self._workload_for_pod(ns, pod)
+                if workload is not None:
+                    return workload
+        return None
+
+    def _known_deployment(self, ns, name):
+        return Workload("Deployment", ns, name) if (ns, name) in self._deployments else None
+
+
+class _maybe:
+    """`with _maybe(lock, held)` takes the lock unless the caller already holds it."""
+
+    def __init__(self, lock, held):
+        self.lock = None if held else lock
+
+    def __enter__(self):
+        if self.lock is not None:
+            self.lock.acquire()
+
+    def __exit__(self, *exc):
+        if self.lock is not None:
+            self.lock.release()
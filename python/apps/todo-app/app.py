@@ -1,96 +1,123 @@
-from flask import Flask, render_template, request, redirect, url_for
-from prometheus_client import Counter, Gauge, generate_latest
-import sqlite3
-import os
+from flask import Flask, Response, jsonify, stream_template, request, redirect, url_for
+from common.metrics import metrics_response
+from common.middleware import instrument
+from prometheus_client import Counter, Gauge
+import db
+import json
+import time
 
 app = Flask(__name__)
-DB_PATH = "todo.db"
+instrument(app)
 
 # Prometheus metrics
-TASKS_TOTAL = Gauge('todo_tasks_total', 'Total number of tasks')
-TASKS_ACTIVE = Gauge('todo_tasks_active', 'Active (incomplete) tasks')
-TASKS_COMPLETED = Gauge('todo_tasks_completed', 'Completed tasks')
+# Every worker sets the same DB-derived values, so report the latest rather than a sum
+TASKS_TOTAL = Gauge('todo_tasks_total', 'Total number of tasks', multiprocess_mode='mostrecent')
+TASKS_ACTIVE = Gauge('todo_tasks_active', 'Active (incomplete) tasks', multiprocess_mode='mostrecent')
+TASKS_COMPLETED = Gauge('todo_tasks_completed', 'Completed tasks', multiprocess_mode='mostrecent')
 TASKS_DELETED = Counter('todo_tasks_deleted_total', 'Total tasks deleted')
 
-# DB Init
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            content TEXT NOT NULL,
-            completed BOOLEAN NOT NULL DEFAULT 0
-        )
-    ''')
-    conn.commit()
-    conn.close()
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl')
 
 def update_metrics():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT COUNT(*) FROM tasks')
-    TASKS_TOTAL.set(c.fetchone()[0])
-    c.execute('SELECT COUNT(*) FROM tasks WHERE completed = 0')
-    TASKS_ACTIVE.set(c.fetchone()[0])
-    c.execute('SELECT COUNT(*) FROM tasks WHERE completed = 1')
-    TASKS_COMPLETED.set(c.fetchone()[0])
-    conn.close()
+    total, active, completed = db.count_tasks()
+    TASKS_TOTAL.set(total)
+    TASKS_ACTIVE.set(active)
+    TASKS_COMPLETED.set(completed)
 
 @app.route('/')
 def index():
     filter_by = request.args.get('filter', 'all')
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    after = request.args.get('after', 0, type=int)
+    limit = request.args.get('limit', db.DEFAULT_PAGE_SIZE, type=int)
 
     if filter_by == 'active':
-        c.execute('SELECT * FROM tasks WHERE completed = 0')
+        page = db.TaskPage(completed=0, after=after, limit=limit)
     elif filter_by == 'completed':
-        c.execute('SELECT * FROM tasks WHERE completed = 1')
+        page = db.TaskPage(completed=1, after=after, limit=limit)
     else:
-        c.execute('SELECT * FROM tasks')
-
-    tasks = c.fetchall()
-    conn.close()
+        page = db.TaskPage(after=after, limit=limit)
 
     update_metrics()
-    return render_template('index.html', tasks=tasks, current_filter=filter_by)
+    # Stream so the header and form reach the client before the rows are read
+    return Response(stream_template('index.html', tasks=page, page=page, current_filter=filter_by))
 
 @app.route('/add', methods=['POST'])
 def add():
     content = request.form.get('content')
     if content:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('INSERT INTO tasks (content, completed) VALUES (?, 0)', (content,))
-        conn.commit()
-        conn.close()
+        db.add_task(content)
     return redirect(url_for('index'))
 
 @app.route('/complete/<int:id>')
 def complete(id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('UPDATE tasks SET completed = 1 WHERE id = ?', (id,))
-    conn.commit()
-    conn.close()
+    db.complete_task(id)
     return redirect(url_for('index'))
 
 @app.route('/delete/<int:id>')
 def delete(id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('DELETE FROM tasks WHERE id = ?', (id,))
-    conn.commit()
-    conn.close()
+    db.delete_task(id)
     TASKS_DELETED.inc()
     return redirect(url_for('index'))
 
+@app.route('/api/tasks/bulk', methods=['POST'])
+def bulk_import():
+    start = time.perf_counter()
+    try:
+        if request.mimetype in NDJSON_TYPES:
+            items = (json.loads(line) for line in request.stream if line.strip())
+        else:
+            items = request.get_json(silent=True)
+            if not isinstance(items, list):
+                raise ValueError("expected a JSON array of tasks")
+        inserted = db.bulk_insert(parse_task(item) for item in items)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    elapsed = time.perf_counter() - start
+    return jsonify(
+        inserted=inserted,
+        seconds=round(elapsed, 4),
+        rows_per_second=round(inserted / elapsed) if elapsed else None,
+    ), 201
+
+@app.route('/api/tasks/export')
+def bulk_export():
+    if request.args.get('format', 'ndjson') == 'json':
+        return Response(export_json(), mimetype='application/json')
+    return Response(export_ndjson(), mimetype='application/x-ndjson')
+
 @app.route('/metrics')
 def metrics():
-    return generate_latest(), 200, {'Content-Type': 'text/plain'}
+    return metrics_response(request.headers)
+
+# Helpers
+
+def parse_task(item):
+    if isinstance(item, str):
+        item = {"content": item}
+    if not isinstance(item, dict):
+        raise ValueError(f"invalid task: {item!r}")
+    content = item.get("content")
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError(f"task is missing 'content': {item!r}")
+    completed = item.get("completed", False)
+    # bool("false") is True: only a JSON boolean or 0/1 is accepted
+    if type(completed) not in (bool, int) or completed not in (0, 1):
+        raise ValueError(f"'completed' must be true, false, 0 or 1: {item!r}")
+    return content, int(completed)
+
+def task_json(row):
+    return json.dumps({"id": row[0], "content": row[1], "completed": bool(row[2])})
+
+def export_ndjson():
+    for row in db.iter_tasks():
+        yield task_json(row) + "\n"
+
+def export_json():
+    yield "["
+    for i, row in enumerate(db.iter_tasks()):
+        yield ("," if i else "") + task_json(row)
+    yield "]"
 
 if __name__ == '__main__':
-    init_db()
+    db.init_db()
     app.run(host='0.0.0.0', port=5000)
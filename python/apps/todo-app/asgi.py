@@ -0,0 +1,264 @@
+"""ASGI variant of app.py: the same routes and templates on Quart + aiosqlite.
+
+    PYTHONPATH=.. uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Reads go through a small pool of reader connections and run concurrently (WAL).
+Writes are funnelled through a bounded queue into a single writer connection,
+which commits whatever has queued up as one transaction.
+"""
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+from quart import Quart, Response, jsonify, redirect, render_template, request, url_for
+
+import db
+from common.metrics import metrics_response
+from app import (
+    NDJSON_TYPES, TASKS_ACTIVE, TASKS_COMPLETED, TASKS_DELETED, TASKS_TOTAL,
+    parse_task, task_json,
+)
+
+READ_CONNECTIONS = int(os.environ.get("TODO_READ_CONNECTIONS", "4"))
+WRITE_QUEUE_SIZE = int(os.environ.get("TODO_WRITE_QUEUE_SIZE", "1024"))
+WRITE_GROUP_SIZE = 64  # max queued writes committed together
+
+app = Quart(__name__)
+
+
+class AsyncDatabase:
+    def __init__(self, path=db.DB_PATH, readers=READ_CONNECTIONS, queue_size=WRITE_QUEUE_SIZE):
+        self.path = path
+        self.readers = readers
+        self.queue_size = queue_size
+
+    async def connect(self, **kwargs):
+        conn = await aiosqlite.connect(self.path, timeout=5, cached_statements=256, **kwargs)
+        for pragma in db.PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    async def start(self):
+        db.init_db()
+        # Autocommit mode: the write loop issues BEGIN/COMMIT itself
+        self._writer = await self.connect(isolation_level=None)
+        self._readers = asyncio.Queue()
+        for _ in range(self.readers):
+            self._readers.put_nowait(await self.connect())
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._inflight = []
+        self._task = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        # Nobody will run these any more; don't leave their callers waiting
+        pending = list(self._inflight)
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("database is shutting down"))
+        await self._writer.close()
+        while not self._readers.empty():
+            await self._readers.get_nowait().close()
+
+    @asynccontextmanager
+    async def reader(self):
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def write(self, op):
+        """Queue `op(conn)` for the writer and wait for its result.
+
+        Blocks while the queue is full, which pushes back on clients instead of
+        letting pending writes pile up without bound.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, future))
+        return await future
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < WRITE_GROUP_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._inflight = batch
+            try:
+                results = await self._write_batch(batch)
+            except Exception as e:
+                # BEGIN hit SQLITE_BUSY, an op closed the transaction...: fail this
+                # batch and keep draining the queue
+                if self._writer.in_transaction:
+                    try:
+                        await self._writer.execute("ROLLBACK")
+                    except Exception:
+                        pass
+                results = [(future, None, e) for _, future in batch]
+            self._inflight = []
+
+            for future, result, error in results:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    async def _write_batch(self, batch):
+        # One commit for the whole group; a savepoint per op keeps a failing
+        # write from rolling back the others.
+        results = []
+        await self._writer.execute("BEGIN IMMEDIATE")
+        for op, future in batch:
+            await self._writer.execute("SAVEPOINT op")
+            try:
+                result = await op(self._writer)
+            except Exception as e:
+                await self._writer.execute("ROLLBACK TO op")
+                await self._writer.execute("RELEASE op")
+                results.append((future, None, e))
+                continue
+            await self._writer.execute("RELEASE op")
+            results.append((future, result, None))
+        await self._writer.execute("COMMIT")
+        return results
+
+
+database = AsyncDatabase()
+
+
+class PrefetchedPage:
+    """Same interface as db.TaskPage for a page that has already been read."""
+
+    def __init__(self, rows, after, limit):
+        self.after = after
+        self.limit = limit
+        self.has_more = len(rows) > limit
+        self.rows = rows[:limit]
+        self.last_id = self.rows[-1][0] if self.rows else after
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+@app.before_serving
+async def startup():
+    await database.start()
+
+
+@app.after_serving
+async def shutdown():
+    await database.stop()
+
+
+async def update_metrics():
+    async with database.reader() as conn:
+        async with conn.execute(db.SQL_READ_COUNTS) as cursor:
+            total, completed = await cursor.fetchone()
+    TASKS_TOTAL.set(total)
+    TASKS_ACTIVE.set(total - completed)
+    TASKS_COMPLETED.set(completed)
+
+
+@app.route('/')
+async def index():
+    filter_by = request.args.get('filter', 'all')
+    after = max(request.args.get('after', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', db.DEFAULT_PAGE_SIZE, type=int), 1), db.MAX_PAGE_SIZE)
+
+    if filter_by == 'active':
+        sql, params = db.SQL_PAGE_BY_STATUS, (0, after, limit + 1)
+    elif filter_by == 'completed':
+        sql, params = db.SQL_PAGE_BY_STATUS, (1, after, limit + 1)
+    else:
+        sql, params = db.SQL_PAGE_ALL, (after, limit + 1)
+
+    async with database.reader() as conn:
+        async with conn.execute(sql, params) as cursor:
+            page = PrefetchedPage(await cursor.fetchall(), after, limit)
+
+    await update_metrics()
+    return await render_template('index.html', tasks=page, page=page, current_filter=filter_by)
+
+
+@app.route('/add', methods=['POST'])
+async def add():
+    content = (await request.form).get('content')
+    if content:
+        await database.write(lambda conn: conn.execute(db.SQL_INSERT, (content,)))
+    return redirect(url_for('index'))
+
+
+@app.route('/complete/<int:id>')
+async def complete(id):
+    await database.write(lambda conn: conn.execute(db.SQL_COMPLETE, (id,)))
+    return redirect(url_for('index'))
+
+
+@app.route('/delete/<int:id>')
+async def delete(id):
+    await database.write(lambda conn: conn.execute(db.SQL_DELETE, (id,)))
+    TASKS_DELETED.inc()
+    return redirect(url_for('index'))
+
+
+@app.route('/api/tasks/bulk', methods=['POST'])
+async def bulk_import():
+    start = time.perf_counter()
+    try:
+        body = await request.get_data(as_text=True)
+        if request.mimetype in NDJSON_TYPES:
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body or "null")
+            if not isinstance(items, list):
+                raise ValueError("expected a JSON array of tasks")
+        rows = [parse_task(item) for item in items]
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    await database.write(lambda conn: conn.executemany(db.SQL_INSERT_FULL, rows))
+    elapsed = time.perf_counter() - start
+    return jsonify(
+        inserted=len(rows),
+        seconds=round(elapsed, 4),
+        rows_per_second=round(len(rows) / elapsed) if elapsed else None,
+    ), 201
+
+
+@app.route('/api/tasks/export')
+async def bulk_export():
+    as_json = request.args.get('format', 'ndjson') == 'json'
+
+    async def generate():
+        async with database.reader() as conn:
+            async with conn.execute(db.SQL_EXPORT) as cursor:
+                if as_json:
+                    yield "["
+                first = True
+                while rows := await cursor.fetchmany(db.BULK_BATCH_SIZE):
+                    for row in rows:
+                        if as_json:
+                            yield ("" if first else ",") + task_json(row)
+                        else:
+                            yield task_json(row) + "\n"
+                        first = False
+                if as_json:
+                    yield "]"
+
+    return Response(generate(), mimetype='application/json' if as_json else 'application/x-ndjson')
+
+
+@app.route('/metrics')
+async def metrics():
+    return metrics_response(request.headers)
@@ -0,0 +1,263 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+DB_PATH = os.environ.get("TODO_DB_PATH", "todo.db")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+BULK_BATCH_SIZE = 1000
+
+# Applied once per connection. WAL lets readers run while a writer commits,
+# synchronous=NORMAL is durable enough in WAL mode and avoids an fsync per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=268435456",  # 256MB
+    "PRAGMA temp_store=MEMORY",
+)
+
+# sqlite3 caches prepared statements per connection keyed by the SQL text,
+# so every query lives here as a constant and is reused verbatim.
+SQL_CREATE_TASKS = '''
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content TEXT NOT NULL,
+        completed BOOLEAN NOT NULL DEFAULT 0
+    )
+'''
+# Single-row counter table kept in step with `tasks` by triggers, so the page
+# can read totals in O(1) instead of scanning the table.
+SQL_CREATE_COUNTS = '''
+    CREATE TABLE IF NOT EXISTS task_counts (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total INTEGER NOT NULL DEFAULT 0,
+        completed INTEGER NOT NULL DEFAULT 0
+    )
+'''
+SQL_CREATE_COUNT_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS task_counts_insert AFTER INSERT ON tasks
+    BEGIN
+        UPDATE task_counts SET total = total + 1,
+                               completed = completed + (NEW.completed != 0)
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS task_counts_delete AFTER DELETE ON tasks
+    BEGIN
+        UPDATE task_counts SET total = total - 1,
+                               completed = completed - (OLD.completed != 0)
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS task_counts_update AFTER UPDATE OF completed ON tasks
+    BEGIN
+        UPDATE task_counts SET completed = completed + (NEW.completed != 0) - (OLD.completed != 0)
+        WHERE id = 1;
+    END
+    ''',
+)
+SQL_SEED_COUNTS = 'INSERT OR IGNORE INTO task_counts (id, total, completed) VALUES (1, 0, 0)'
+SQL_READ_COUNTS = 'SELECT total, completed FROM task_counts WHERE id = 1'
+SQL_RECONCILE_COUNTS = '''
+    UPDATE task_counts SET
+        total = (SELECT COUNT(*) FROM tasks),
+        completed = (SELECT COUNT(*) FROM tasks WHERE completed != 0)
+    WHERE id = 1
+'''
+# Serves the filtered list pages: WHERE completed = ? AND id > ? ORDER BY id
+SQL_CREATE_STATUS_INDEX = 'CREATE INDEX IF NOT EXISTS idx_tasks_completed_id ON tasks (completed, id)'
+SQL_PAGE_ALL = 'SELECT id, content, completed FROM tasks WHERE id > ? ORDER BY id LIMIT ?'
+SQL_PAGE_BY_STATUS = 'SELECT id, content, completed FROM tasks WHERE completed = ? AND id > ? ORDER BY id LIMIT ?'
+SQL_INSERT = 'INSERT INTO tasks (content, completed) VALUES (?, 0)'
+SQL_INSERT_FULL = 'INSERT INTO tasks (content, completed) VALUES (?, ?)'
+SQL_EXPORT = 'SELECT id, content, completed FROM tasks ORDER BY id'
+SQL_COMPLETE = 'UPDATE tasks SET completed = 1 WHERE id = ?'
+SQL_DELETE = 'DELETE FROM tasks WHERE id = ?'
+SQL_COUNT_ALL = 'SELECT COUNT(*) FROM tasks'
+SQL_COUNT_COMPLETED = 'SELECT COUNT(*) FROM tasks WHERE completed != 0'
+
+
+class ConnectionPool:
+    """Keeps idle connections around so requests reuse them instead of reconnecting.
+
+    The Flask dev server starts a thread per request, so connections are checked
+    out and returned rather than pinned to a thread for its lifetime.
+    """
+
+    def __init__(self, path=DB_PATH, max_idle=16, cached_statements=256):
+        self.path = path
+        self.max_idle = max_idle
+        self.cached_statements = cached_statements
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=5,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self.connect()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+pool = ConnectionPool()
+
+
+def init_db():
+    # Use a throwaway connection so nothing is inherited by forked workers
+    conn = pool.connect()
+    with conn:
+        conn.execute(SQL_CREATE_TASKS)
+        conn.execute(SQL_CREATE_STATUS_INDEX)
+        conn.execute(SQL_CREATE_COUNTS)
+        for trigger in SQL_CREATE_COUNT_TRIGGERS:
+            conn.execute(trigger)
+        conn.execute(SQL_SEED_COUNTS)
+        drift = _reconcile(conn)
+    conn.close()
+    if any(drift):
+        print(f"[WARN] Task counters were off by {drift} (total, completed); reconciled.", flush=True)
+    return drift
+
+
+def reconcile_counts():
+    """Recompute the counters from `tasks` and return how far they had drifted."""
+    with pool.connection() as conn, conn:
+        return _reconcile(conn)
+
+
+def _reconcile(conn):
+    before = conn.execute(SQL_READ_COUNTS).fetchone()
+    conn.execute(SQL_RECONCILE_COUNTS)
+    after = conn.execute(SQL_READ_COUNTS).fetchone()
+    return after[0] - before[0], after[1] - before[1]
+
+
+class TaskPage:
+    """One keyset page of tasks (`id > after`), read lazily off the cursor.
+
+    Iterating it streams rows; `has_more` and `last_id` are filled in as it goes,
+    so a template can render the "next" link after the list.
+    """
+
+    def __init__(self, completed=None, after=0, limit=DEFAULT_PAGE_SIZE):
+        self.completed = completed
+        self.after = max(after, 0)
+        self.limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        self.last_id = self.after
+        self.has_more = False
+
+    def __iter__(self):
+        with pool.connection() as conn:
+            # Ask for one extra row to learn whether a next page exists
+            if self.completed is None:
+                cursor = conn.execute(SQL_PAGE_ALL, (self.after, self.limit + 1))
+            else:
+                cursor = conn.execute(SQL_PAGE_BY_STATUS, (self.completed, self.after, self.limit + 1))
+            try:
+                for count, row in enumerate(cursor):
+                    if count == self.limit:
+                        self.has_more = True
+                        break
+                    self.last_id = row[0]
+                    yield row
+            finally:
+                cursor.close()
+
+
+def bulk_insert(rows):
+    """Insert (content, completed) rows in one transaction; returns how many were written.
+
+    `rows` may be a lazy iterable; it is consumed in BULK_BATCH_SIZE chunks so a
+    large upload never sits in memory at once. Any error rolls back everything.
+    """
+    inserted = 0
+    rows = iter(rows)
+    with pool.connection() as conn, conn:
+        while True:
+            batch = list(islice(rows, BULK_BATCH_SIZE))
+            if not batch:
+                break
+            conn.executemany(SQL_INSERT_FULL, batch)
+            inserted += len(batch)
+    return inserted
+
+
+def iter_tasks(batch_size=BULK_BATCH_SIZE):
+    with pool.connection() as conn:
+        cursor = conn.execute(SQL_EXPORT)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+
+def add_task(content):
+    with pool.connection() as conn, conn:
+        conn.execute(SQL_INSERT, (content,))
+
+
+def complete_task(task_id):
+    with pool.connection() as conn, conn:
+        conn.execute(SQL_COMPLETE, (task_id,))
+
+
+def delete_task(task_id):
+    with pool.connection() as conn, conn:
+        conn.execute(SQL_DELETE, (task_id,))
+
+
+def count_tasks():
+    with pool.connection() as conn:
+        total, completed = conn.execute(SQL_READ_COUNTS).fetchone()
+    return total, total - completed, completed
+
+
+def scan_counts():
+    # Full-table recount; only used to check the counters, never on the request path
+    with pool.connection() as conn:
+        total = conn.execute(SQL_COUNT_ALL).fetchone()[0]
+        completed = conn.execute(SQL_COUNT_COMPLETED).fetchone()[0]
+    return total, total - completed, completed
@@ -1,15 +1,20 @@
 import subprocess
+import threading
+import queue
 import time
 import sys
 import json
 import functools
+from datetime import datetime
+
+from kube_common import get_client, load_api
 
 print = functools.partial(print, flush=True)  # Ensure print is flushed immediately
 
 def is_ignorable_pod(pod):
     name = pod["metadata"]["name"]
-    labels = pod["metadata"].get("labels", {})
-    owner_refs = pod["metadata"].get("ownerReferences", [])
+    labels = pod["metadata"].get("labels") or {}
+    owner_refs = pod["metadata"].get("ownerReferences") or []
     phase = pod["status"].get("phase", "")
 
     return (
@@ -19,80 +24,259 @@ def is_ignorable_pod(pod):
         any(o.get("kind") == "Job" or o.get("name", "").startswith("helm-install-") for o in owner_refs)
     )
 
-def check_all_pods_ready(max_attempts=20, delay=15):
-    last_data = None  # Save for final output
+def is_pod_ready(pod):
+    phase = pod["status"].get("phase", "")
+    container_statuses = pod["status"].get("containerStatuses")
+    ready_conditions = pod["status"].get("conditions") or []
+
+    return not (
+        phase != "Running"
+        or not isinstance(container_statuses, list)
+        or any(not c.get("ready", False) for c in container_statuses)
+        or any(
+            cond.get("type") == "Ready" and cond.get("status") != "True"
+            for cond in ready_conditions
+        )
+    )
+
+def time_to_ready(pod):
+    """Seconds from pod creation until its Ready condition last turned True."""
+    created = pod["metadata"].get("creationTimestamp")
+    for cond in pod["status"].get("conditions") or []:
+        if cond.get("type") == "Ready" and cond.get("status") == "True" and created:
+            return (_parse_time(cond["lastTransitionTime"]) - _parse_time(created)).total_seconds()
+    return None
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+# ─────────────────────────────────────────────
+# Pod event sources. Each puts ("SYNCED", pod dicts) with every full listing,
+# the first one and any after a lost watch, then (event type, pod dict) for
+# every change. A lost watch is relisted with backoff, announced by
+# ("RETRY", reason); an error it cannot recover from ends the source with
+# ("ERROR", exception).
+
+RELIST_MIN_DELAY = 1
+RELIST_MAX_DELAY = 30
+
+class PodWatchError(Exception):
+    pass
+
+def stream_from_api(events, stop):
+    from kubernetes import client, watch
+    from kubernetes.client.rest import ApiException
+    from urllib3.exceptions import HTTPError
+
+    load_api()
+    v1 = client.CoreV1Api()
+    to_dict = client.ApiClient().sanitize_for_serialization  # same camelCase shape as kubectl -o json
+
+    delay = RELIST_MIN_DELAY
+    while not stop.is_set():
+        try:
+            listing = v1.list_pod_for_all_namespaces()
+            events.put(("SYNCED", [to_dict(pod) for pod in listing.items]))
+
+            resource_version = listing.metadata.resource_version
+            while not stop.is_set():
+                w = watch.Watch()
+                for event in w.stream(v1.list_pod_for_all_namespaces, resource_version=resource_version, timeout_seconds=60):
+                    resource_version = event["object"].metadata.resource_version
+                    events.put((event["type"], to_dict(event["object"])))
+                    delay = RELIST_MIN_DELAY
+                    if stop.is_set():
+                        w.stop()
+                        break
+            return
+        except ApiException as e:
+            if e.status == 410:  # Gone: our resourceVersion expired, list again
+                continue
+            if e.status and e.status < 500 and e.status != 429:
+                raise  # e.g. 401/403: relisting will not fix it
+            reason = f"API error {e.status}: {e.reason}"
+        except (HTTPError, OSError) as e:
+            reason = f"{type(e).__name__}: {e}"
+        events.put(("RETRY", f"{reason}; relisting in {delay}s"))
+        stop.wait(delay)
+        delay = min(delay * 2, RELIST_MAX_DELAY)
+
+def _kill_on_stop(stop, procs):
+    # Unblocks the readline() the source thread is waiting in
+    stop.wait()
+    if procs:
+        procs[-1].kill()
 
-    for attempt in range(1, max_attempts + 1):
-        result = subprocess.run(
-            ["kubectl", "get", "pods", "-A", "-o", "json"],
-            capture_output=True, text=True
+def stream_from_kubectl(events, stop):
+    current = []
+    threading.Thread(target=_kill_on_stop, args=(stop, current), daemon=True).start()
+
+    delay = RELIST_MIN_DELAY
+    while not stop.is_set():
+        # One long-lived watch instead of a full listing per attempt. It is started
+        # before the listing so no change falls between the two.
+        proc = subprocess.Popen(
+            ["kubectl", "get", "pods", "-A", "-o", "json", "--watch-only", "--output-watch-events"],
+            stdout=subprocess.PIPE, text=True,
         )
-        if result.returncode != 0:
-            print(f"[ERROR] Failed to run kubectl: {result.stderr}")
-            sys.exit(1)
+        current.append(proc)
+        try:
+            events.put(("SYNCED", get_client().pods(max_age=0)))
+
+            # The watch prints one JSON document per event, not one per line
+            decoder = json.JSONDecoder()
+            buffer = ""
+            for chunk in iter(proc.stdout.readline, ""):
+                buffer += chunk
+                while buffer.strip():
+                    try:
+                        doc, end = decoder.raw_decode(buffer.lstrip())
+                    except ValueError:
+                        break  # incomplete document, read more
+                    buffer = buffer.lstrip()[end:]
+                    events.put((doc["type"], doc["object"]))
+                    delay = RELIST_MIN_DELAY
+                if stop.is_set():
+                    break
+            if stop.is_set():
+                return
+            reason = f"kubectl watch exited with code {proc.wait()}"
+        except (RuntimeError, subprocess.TimeoutExpired, ValueError) as e:  # the listing failed
+            reason = str(e)
+        finally:
+            proc.kill()
+            proc.wait()
+        events.put(("RETRY", f"{reason}; relisting in {delay}s"))
+        stop.wait(delay)
+        delay = min(delay * 2, RELIST_MAX_DELAY)
+
+def _run_source(source, events, stop):
+    try:
+        source(events, stop)
+    except Exception as e:
+        events.put(("ERROR", e))
+
+# ─────────────────────────────────────────────
+
+def wait_for_pods_ready(timeout=300, use_api=True):
+    """Follow pod events until every important pod is Ready or `timeout` expires.
 
-        data = json.loads(result.stdout)
-        last_data = data  # Save for final report
-        unready_pods = []
+    Returns (ready, pods): pods maps (namespace, name) to the latest pod dict.
+    A lost watch is relisted until the timeout; raises PodWatchError if the
+    watch cannot be recovered (e.g. the API denies access).
+    """
+    source = stream_from_kubectl
+    if use_api:
+        if get_client().backend == "api":
+            source = stream_from_api
+        else:
+            print("[INFO] Python kubernetes client not available, watching through kubectl")
 
-        for pod in data["items"]:
-            if is_ignorable_pod(pod):
+    events, stop = queue.Queue(), threading.Event()
+    source_thread = threading.Thread(target=_run_source, args=(source, events, stop), daemon=True)
+    source_thread.start()
+
+    started = time.monotonic()
+    deadline = started + timeout
+    pods, unready, synced = {}, set(), False
+    last_report = 0
+
+    def update(event_type, pod, was_unready):
+        key = (pod["metadata"]["namespace"], pod["metadata"]["name"])
+        if event_type == "DELETED" or is_ignorable_pod(pod):
+            pods.pop(key, None)
+            unready.discard(key)
+        else:
+            pods[key] = pod
+            if is_pod_ready(pod):
+                if key in was_unready and synced:
+                    print(f"[OK] {key[0]}/{key[1]} is Ready ({time.monotonic() - started:.1f}s)")
+                unready.discard(key)
+            else:
+                unready.add(key)
+
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False, pods
+            try:
+                event_type, pod = events.get(timeout=min(remaining, 10))
+            except queue.Empty:
+                print(f"[CHECK] Still waiting for {len(unready)} pod(s): {', '.join(sorted(n for _, n in unready))}")
                 continue
 
-            phase = pod["status"].get("phase", "")
-            container_statuses = pod["status"].get("containerStatuses", [])
-            ready_conditions = pod["status"].get("conditions", [])
+            if event_type == "ERROR":
+                raise PodWatchError(f"Pod watch failed: {pod}") from pod
+            if event_type == "RETRY":
+                print(f"[WARN] Pod watch lost ({pod})")
+                continue
+            if event_type == "SYNCED":
+                # A full listing replaces what we had: after a relist this drops
+                # pods deleted while the watch was down
+                was_unready = set(unready)
+                pods.clear()
+                unready.clear()
+                for item in pod:
+                    update("ADDED", item, was_unready)
+                synced = True
+            else:
+                update(event_type, pod, unready)
 
-            if (
-                phase != "Running"
-                or not isinstance(container_statuses, list)
-                or any(not c.get("ready", False) for c in container_statuses)
-                or any(
-                    cond.get("type") == "Ready" and cond.get("status") != "True"
-                    for cond in ready_conditions
-                )
-            ):
-                unready_pods.append(pod["metadata"]["name"])
+            if not synced:
+                continue
+            if not unready:
+                return True, pods
+            if len(unready) != last_report:
+                print(f"[CHECK] Unready pods: {len(unready)}")
+                last_report = len(unready)
+    finally:
+        stop.set()
+        if source is stream_from_kubectl:
+            # Let it kill its kubectl watch before the interpreter exits
+            source_thread.join(timeout=2)
 
-        print(f"[CHECK] Unready pods: {len(unready_pods)} (attempt {attempt}/{max_attempts})")
+def print_time_to_ready(pods):
+    timings = sorted(
+        ((time_to_ready(pod), ns, name) for (ns, name), pod in pods.items() if is_pod_ready(pod)),
+        key=lambda t: -(t[0] or 0),
+    )
+    print("\n⏱️ Time to Ready (creation → Ready), slowest first:")
+    for seconds, ns, name in timings:
+        shown = f"{seconds:7.1f}s" if seconds is not None else "      ?"
+        print(f"  {shown}  {ns}/{name}")
 
-        if not unready_pods:
-            print("✅ All important pods are Ready!")
+def check_all_pods_ready(timeout=300):
+    started = time.monotonic()
+    try:
+        ready, pods = wait_for_pods_ready(timeout)
+    except PodWatchError as e:
+        print(f"[ERROR] {e}")
+        return 1
 
-            print("\n📋 All Running pods (wide):")
-            subprocess.run(["kubectl", "get", "pods", "-A", "-o", "wide"])
+    if ready:
+        print(f"✅ All important pods are Ready! ({time.monotonic() - started:.1f}s)")
+        print_time_to_ready(pods)
 
-            return 0
+        print("\n📋 All Running pods (wide):")
+        subprocess.run(["kubectl", "get", "pods", "-A", "-o", "wide"])
 
-        time.sleep(delay)
+        return 0
 
     print("❌ Pods failed to become Ready in time.")
     print("\n📋 Final pod status (wide):")
     subprocess.run(["kubectl", "get", "pods", "-A", "-o", "wide"])
 
     print("\n🧪 Detailed unready pods:")
-    for pod in last_data["items"]:
-        if is_ignorable_pod(pod):
+    for (namespace, name), pod in sorted(pods.items()):
+        if is_pod_ready(pod):
             continue
-
-        phase = pod["status"].get("phase", "")
-        container_statuses = pod["status"].get("containerStatuses", [])
-        ready_conditions = pod["status"].get("conditions", [])
-
-        if (
-            phase != "Running"
-            or not isinstance(container_statuses, list)
-            or any(not c.get("ready", False) for c in container_statuses)
-            or any(
-                cond.get("type") == "Ready" and cond.get("status") != "True"
-                for cond in ready_conditions
-            )
-        ):
-            print(f"- Namespace: {pod['metadata']['namespace']}")
-            print(f"  Pod:       {pod['metadata']['name']}")
-            print(f"  Phase:     {phase}")
-            print(f"  Ready:     {[c.get('ready') for c in container_statuses]}")
-            print("---")
+        container_statuses = pod["status"].get("containerStatuses") or []
+        print(f"- Namespace: {namespace}")
+        print(f"  Pod:       {name}")
+        print(f"  Phase:     {pod['status'].get('phase', '')}")
+        print(f"  Ready:     {[c.get('ready') for c in container_statuses]}")
+        print("---")
 
     return 1
 
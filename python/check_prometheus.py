@@ -1,98 +1,178 @@
-import subprocess
 import time
 import sys
 import json
+import argparse
 import functools
+import http.client
+from urllib.parse import urlencode
+
+from kube_common import get_client
 
 print = functools.partial(print, flush=True)
 
-def get_ingress_ip():
+# One job per ServiceMonitor in kubernetes/monitoring/servicemonitors; without
+# a jobLabel the job is the name of the Service it selects.
+EXPECTED_JOBS = ("todo-service", "microfail-service", "devops-utils-service", "remediator")
+
+# A single query answers "how many targets per job are up, and how many down"
+JOB_HEALTH_QUERY = 'count_values by (job) ("up", up)'
+
+class PrometheusQuery:
+    """Instant queries over one keep-alive connection to the Prometheus ingress."""
+
+    def __init__(self, address, host="prometheus.kube-lab.local", port=80, timeout=5):
+        self.address = address
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.conn = None
+
+    def query(self, expr):
+        path = "/api/v1/query?" + urlencode({"query": expr})
+        for attempt in (1, 2):
+            reused = self.conn is not None
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.address, self.port, timeout=self.timeout)
+            try:
+                self.conn.request("GET", path, headers={"Host": self.host, "Accept": "application/json"})
+                response = self.conn.getresponse()
+                body = response.read()
+                if response.will_close:
+                    self.close()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server dropped our idle connection; retry once on a new one
+                self.close()
+                if not reused or attempt == 2:
+                    raise
+            except Exception:
+                self.close()
+                raise
+
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}: {body[:200].decode(errors='replace')}")
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise RuntimeError(f"not JSON (is the ingress serving Prometheus yet?): {body[:200].decode(errors='replace')}")
+        if data.get("status") != "success":
+            raise RuntimeError(f"query failed: {data.get('error', data)}")
+        return data["data"]["result"]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+def job_health(prometheus, expected_jobs):
+    """Per-job target counts, expected jobs first. A job is healthy when all its targets are up."""
+    counts = {}
+    for series in prometheus.query(JOB_HEALTH_QUERY):
+        job = series["metric"].get("job", "unknown")
+        state = "up" if series["metric"].get("up") == "1" else "down"
+        counts.setdefault(job, {"up": 0, "down": 0})[state] += int(float(series["value"][1]))
+
+    results = []
+    for job in list(expected_jobs) + sorted(set(counts) - set(expected_jobs)):
+        up = counts.get(job, {}).get("up", 0)
+        down = counts.get(job, {}).get("down", 0)
+        results.append({
+            "job": job,
+            "expected": job in expected_jobs,
+            "targets": up + down,
+            "up": up,
+            "down": down,
+            "healthy": up > 0 and down == 0,
+        })
+    return results
+
+def wait_for_jobs(prometheus, expected_jobs=EXPECTED_JOBS, timeout=120, min_delay=0.25, max_delay=8):
+    """Poll until every expected job is healthy or `timeout` expires.
+
+    The delay starts at `min_delay` and doubles while nothing changes, up to
+    `max_delay`; it drops back whenever another job turns healthy.
+    Returns (healthy, per-job results of the last successful query).
+    """
+    deadline = time.monotonic() + timeout
+    delay = min_delay
+    results, last_healthy, last_error = [], -1, None
+
+    while True:
+        try:
+            results = job_health(prometheus, expected_jobs)
+            last_error = None
+            missing = [r["job"] for r in results if r["expected"] and not r["healthy"]]
+            if not missing:
+                return True, results
+            healthy = sum(r["healthy"] for r in results if r["expected"])
+            if healthy > last_healthy:
+                print(f"[WAIT] {healthy}/{len(expected_jobs)} jobs healthy, waiting for: {', '.join(missing)}")
+                last_healthy = healthy
+                delay = min_delay
+        except (OSError, http.client.HTTPException, RuntimeError) as e:
+            if str(e) != last_error:
+                print(f"[WARN] Prometheus not ready yet: {e}")
+                last_error = str(e)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False, results
+        time.sleep(min(delay, remaining))
+        delay = min(max_delay, delay * 2)
+
+def print_results(results):
+    for r in results:
+        icon = "✅" if r["healthy"] else ("❌" if r["expected"] else "⚠️")
+        extra = "" if r["expected"] else " (not expected)"
+        print(f"  {icon} {r['job']:<22} {r['up']}/{r['targets']} targets up{extra}")
+
+def check_prometheus_targets(expected_jobs=EXPECTED_JOBS, timeout=120, address=None, report=None, port=80):
+    prometheus = PrometheusQuery(address or get_client().ingress_ip(), port=port)
+    print(f"[INFO] Waiting for Prometheus jobs: {', '.join(expected_jobs)}")
+
+    start = time.monotonic()
+    try:
+        healthy, results = wait_for_jobs(prometheus, expected_jobs, timeout)
+    finally:
+        prometheus.close()
+    elapsed = time.monotonic() - start
+
+    print("\n📋 Prometheus jobs:")
+    print_results(results)
+    if report:
+        with open(report, "w") as f:
+            json.dump({"healthy": healthy, "elapsed_ms": round(elapsed * 1000, 2), "jobs": results}, f, indent=2)
+
+    if healthy:
+        print(f"\n✅ All {len(expected_jobs)} expected Prometheus jobs are up ({elapsed * 1000:.0f} ms)")
+        return 0
+
+    print("\n❌ Prometheus targets not healthy after timeout.")
+    print("🔎 Ingress status:")
     try:
-        result = subprocess.run(
-            ["kubectl", "get", "ingress", "-A", "-o", "json"],
-            capture_output=True, text=True, timeout=10
-        )
-        ingress_data = json.loads(result.stdout)
-        for item in ingress_data.get("items", []):
-            addresses = item.get("status", {}).get("loadBalancer", {}).get("ingress", [])
-            if addresses:
-                ip = addresses[0].get("ip") or addresses[0].get("hostname")
-                if ip:
-                    return ip
+        ingresses = get_client().ingresses()
     except Exception as e:
-        print(f"[ERROR] Failed to extract Ingress IP: {e}")
-    # Fallback to localhost if nothing is found
-    print("[WARN] Falling back to 127.0.0.1 as Ingress IP.")
-    return "127.0.0.1"
-
-def check_prometheus_targets(max_attempts=10, delay=10):
-    ingress_ip = get_ingress_ip()
-    url = f"http://{ingress_ip}/api/v1/targets"
-    headers = {"Host": "prometheus.kube-lab.local"}
-
-    for attempt in range(1, max_attempts + 1):
-        print(f"[INFO] Checking Prometheus targets (attempt {attempt}/{max_attempts})")
-
-        if attempt == 1:
-            print("🔎 Verifying Ingress status:")
-            subprocess.run(["kubectl", "get", "ingress", "-A", "-o", "wide"])
-            print()
+        print(f"[ERROR] Could not list ingresses: {e}")
+        ingresses = []
+    for item in ingresses:
+        meta = item["metadata"]
+        hosts = ", ".join(r.get("host", "*") for r in item.get("spec", {}).get("rules") or [])
+        addresses = (item.get("status", {}).get("loadBalancer") or {}).get("ingress") or []
+        address = ", ".join(a.get("ip") or a.get("hostname", "") for a in addresses) or "<none>"
+        print(f"  {meta['namespace']}/{meta['name']}: {hosts} -> {address}")
+    return 1
 
-        try:
-            result = subprocess.run(
-                ["curl", "-s", "-H", f"Host: {headers['Host']}", url],
-                capture_output=True, text=True, timeout=5
-            )
-
-            if result.returncode != 0 or not result.stdout.strip():
-                print("[WARN] Prometheus not reachable yet.")
-                time.sleep(delay)
-                continue
-
-            if not result.stdout.strip().startswith("{"):
-                print("[WARN] Prometheus responded but not with JSON.")
-                print("[DEBUG] Raw output snippet:")
-                print(result.stdout.strip()[:300] + "...\n")
-                time.sleep(delay)
-                continue
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wait until every expected Prometheus job is up.")
+    parser.add_argument("--jobs", help="comma-separated job names (default: the lab's ServiceMonitor jobs)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--address", help="ingress address to use instead of the one in the Ingress status")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--report", help="write the per-job results as JSON to this path")
+    args = parser.parse_args(argv)
 
-            try:
-                data = json.loads(result.stdout)
-            except json.JSONDecodeError as e:
-                print(f"[ERROR] Failed to parse JSON: {e}")
-                print("[DEBUG] Full raw output:")
-                print(result.stdout.strip()[:500] + "...\n")
-                time.sleep(delay)
-                continue
-
-            active_targets = data.get("data", {}).get("activeTargets", [])
-
-            if not active_targets:
-                print("[WARN] No active targets found yet.")
-                time.sleep(delay)
-                continue
-
-            healthy = 0
-            for target in active_targets:
-                job = target.get("labels", {}).get("job", "unknown")
-                status = target.get("health", "unknown")
-                print(f"[INFO] Prometheus target: {job} — status: {status}")
-                if status == "up":
-                    healthy += 1
-
-            if healthy:
-                print(f"✅ Prometheus has {healthy} healthy targets")
-                return 0
-            else:
-                print(f"[WAIT] Prometheus is up, but targets not healthy (attempt {attempt}/{max_attempts})")
-
-        except Exception as e:
-            print(f"[ERROR] Exception occurred: {e}")
-
-        time.sleep(delay)
-
-    print("❌ Prometheus targets not healthy after timeout.")
-    return 1
+    jobs = tuple(j.strip() for j in args.jobs.split(",") if j.strip()) if args.jobs else EXPECTED_JOBS
+    return check_prometheus_targets(jobs, args.timeout, args.address, args.report, args.port)
 
 if __name__ == "__main__":
-    sys.exit(check_prometheus_targets())
+    sys.exit(main())
@@ -1,99 +1,412 @@
-import subprocess
 import sys
 import json
+import time
+import socket
+import signal
+import argparse
+import threading
 import functools
+import http.client
+from collections import deque
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+from kube_common import get_client, ingress_hosts, ingress_ip
 
 print = functools.partial(print, flush=True)
 
-def get_ingress_hosts():
-    try:
-        result = subprocess.run(
-            ["kubectl", "get", "ingress", "-A", "-o", "json"],
-            capture_output=True,
-            text=True,
-            timeout=10,
-        )
-        if result.returncode != 0:
-            print(f"[ERROR] Failed to get ingress: {result.stderr}")
-            sys.exit(1)
-
-        ingress_data = json.loads(result.stdout)
-        hosts = set()
-
-        for item in ingress_data.get("items", []):
-            rules = item.get("spec", {}).get("rules", [])
-            for rule in rules:
-                host = rule.get("host")
-                if host:
-                    hosts.add(host)
-
-        return sorted(hosts)
+def fetch_ingresses():
+    # A fresh, resourceVersion-aware listing through the shared client
+    return get_client().ingresses(max_age=0)
 
+def get_ingresses():
+    try:
+        return get_client().ingresses()
     except Exception as e:
         print(f"[ERROR] Could not retrieve ingress hosts: {e}")
         sys.exit(1)
 
-def get_ingress_ip():
-    try:
-        result = subprocess.run(
-            ["kubectl", "get", "ingress", "-A", "-o", "json"],
-            capture_output=True, text=True, timeout=10
-        )
-        ingress_data = json.loads(result.stdout)
-        for item in ingress_data.get("items", []):
-            addresses = item.get("status", {}).get("loadBalancer", {}).get("ingress", [])
-            if addresses:
-                ip = addresses[0].get("ip") or addresses[0].get("hostname")
-                if ip:
-                    return ip
-    except Exception as e:
-        print(f"[ERROR] Failed to extract Ingress IP: {e}")
-    # Fallback to localhost if nothing is found
-    print("[WARN] Falling back to 127.0.0.1 as Ingress IP.")
-    return "127.0.0.1"
+# ─────────────────────────────────────────────
+# Every host is served by the same ingress address, so each worker thread
+# keeps one keep-alive connection to it and only changes the Host header.
+
+class Prober:
+    def __init__(self, address, port=80, timeout=5, max_redirects=5):
+        self.address = address
+        self.port = port
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self._local = threading.local()
+
+    def _connection(self, timing):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        start = time.perf_counter()
+        addrinfo = socket.getaddrinfo(self.address, self.port, type=socket.SOCK_STREAM)
+        timing["dns_ms"] = _ms(start)
+        family, socktype, proto, _, sockaddr = addrinfo[0]
+
+        start = time.perf_counter()
+        sock = socket.socket(family, socktype, proto)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(sockaddr)
+        except OSError:
+            sock.close()
+            raise
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        timing["connect_ms"] = _ms(start)
+
+        conn = http.client.HTTPConnection(self.address, self.port, timeout=self.timeout)
+        conn.sock = sock
+        self._local.conn = conn
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _request(self, host, path, timing):
+        # A kept-alive connection the server has since closed fails on first
+        # use; retry once on a fresh one before calling the host down.
+        for attempt in (1, 2):
+            reused = getattr(self._local, "conn", None) is not None
+            conn = self._connection(timing)
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers={"Host": host, "User-Agent": "kube-lab-check-urls"})
+                response = conn.getresponse()
+                timing["ttfb_ms"] = _ms(start)
+                response.read()
+                if response.will_close:
+                    self._drop()
+                return response
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self._drop()
+                if not reused or attempt == 2:
+                    raise
+            except Exception:
+                self._drop()
+                raise
+
+    def probe(self, host):
+        """GET / on `host`, following plain-HTTP redirects like curl -L."""
+        result = {"host": host, "ok": False, "status": None, "dns_ms": 0.0, "connect_ms": 0.0,
+                  "ttfb_ms": None, "total_ms": None, "redirects": 0, "error": None}
+        start = time.perf_counter()
+        path = "/"
+        try:
+            while True:
+                response = self._request(host, path, result)
+                result["status"] = response.status
+                location = response.getheader("Location")
+                if response.status not in (301, 302, 303, 307, 308) or not location:
+                    break
+                if result["redirects"] >= self.max_redirects:
+                    result["error"] = "too many redirects"
+                    break
+                target = urlsplit(location)
+                if target.scheme not in ("", "http"):
+                    result["error"] = f"redirects to {location}"
+                    break
+                host = target.hostname or host
+                path = (target.path or "/") + (f"?{target.query}" if target.query else "")
+                result["redirects"] += 1
+            result["ok"] = result["status"] == 200 and result["error"] is None
+        except socket.timeout:
+            result["error"] = "timed out"
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+        result["total_ms"] = _ms(start)
+        return result
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def probe_all(hosts, address, concurrency=16, timeout=5, port=80, on_result=None):
+    """Probe every host through at most `concurrency` connections; results in host order."""
+    prober = Prober(address, port=port, timeout=timeout)
+
+    def run(host):
+        result = prober.probe(host)
+        if on_result:
+            on_result(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(hosts)))) as pool:
+        return list(pool.map(run, hosts))
+
+def report_result(result):
+    if result["ok"]:
+        print(f"✅ {result['host']} is accessible ({result['total_ms']:.0f} ms)")
+    elif result["error"]:
+        print(f"❌ {result['host']} failed: {result['error']}")
+    else:
+        print(f"❌ {result['host']} returned status code {result['status']}")
+
+def write_report(path, address, results, elapsed):
+    report = {
+        "ingress_address": address,
+        "checked_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "total": len(results),
+        "failed": sum(not r["ok"] for r in results),
+        "hosts": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+# ─────────────────────────────────────────────
+# Daemon mode: probe every host on a schedule and export the results in the
+# Prometheus text format, so the lab gets black-box latency SLIs without a
+# separate blackbox exporter.
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+class LatencyWindow:
+    """The last `size` probes of one host, in a fixed-size ring buffer."""
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)  # (ok, total seconds, ttfb seconds)
+        self.count = {True: 0, False: 0}
+        self.total_sum = 0.0
+        self.ttfb_sum = 0.0
+
+    def add(self, result):
+        total = result["total_ms"] / 1000
+        ttfb = (result["ttfb_ms"] or result["total_ms"]) / 1000
+        self.samples.append((result["ok"], total, ttfb))
+        self.count[result["ok"]] += 1
+        self.total_sum += total
+        self.ttfb_sum += ttfb
 
-def check_url(host):
+    def quantiles(self, index):
+        values = sorted(sample[index] for sample in self.samples)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+    def success_ratio(self):
+        if not self.samples:
+            return 1.0
+        return sum(ok for ok, _, _ in self.samples) / len(self.samples)
+
+class ProbeDaemon:
+    def __init__(self, address=None, port=80, concurrency=16, timeout=5,
+                 interval=15, rediscover=60, window=240, discover=fetch_ingresses):
+        self.fixed_address = address
+        self.port = port
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.interval = interval
+        self.rediscover = rediscover
+        self.window = window
+        self.discover = discover
+        self.prober = None
+        self.windows = {}
+        self.last_up = {}
+        self.last_run = 0.0
+        self.last_discovery = None
+        self.discovery_errors = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def refresh_hosts(self):
+        """Pick up added and removed Ingress hosts; keeps the old set if kubectl fails."""
+        try:
+            ingresses = self.discover()
+        except Exception as e:
+            self.discovery_errors += 1
+            print(f"[WARN] Ingress discovery failed, keeping {len(self.windows)} host(s): {e}")
+            return
+        hosts = set(ingress_hosts(ingresses))
+        address = self.fixed_address or ingress_ip(ingresses, quiet=True)
+        with self._lock:
+            for host in sorted(hosts - self.windows.keys()):
+                print(f"[INFO] ➕ Probing {host}")
+                self.windows[host] = LatencyWindow(self.window)
+            for host in sorted(self.windows.keys() - hosts):
+                print(f"[INFO] ➖ No longer probing {host}")
+                del self.windows[host]
+                self.last_up.pop(host, None)
+        if self.prober is None or self.prober.address != address:
+            print(f"[INFO] Probing through ingress address {address}")
+            self.prober = Prober(address, port=self.port, timeout=self.timeout)
+        self.last_discovery = time.monotonic()
+
+    def probe_once(self, pool):
+        with self._lock:
+            hosts = sorted(self.windows)
+        for result in pool.map(self.prober.probe, hosts):
+            with self._lock:
+                window = self.windows.get(result["host"])
+                if window is None:  # removed while we were probing it
+                    continue
+                window.add(result)
+                changed = self.last_up.get(result["host"]) != result["ok"]
+                self.last_up[result["host"]] = result["ok"]
+            if changed:  # only report transitions, not every round
+                report_result(result)
+        self.last_run = time.time()
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            while not self._stopped.is_set():
+                started = time.monotonic()
+                if self.last_discovery is None or started - self.last_discovery >= self.rediscover:
+                    self.refresh_hosts()
+                if self.prober is not None:
+                    self.probe_once(pool)
+                self._stopped.wait(max(0, self.interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self._stopped.set()
+
+    def render(self):
+        lines = [
+            "# HELP kube_lab_probe_up Whether the last probe of the host returned 200",
+            "# TYPE kube_lab_probe_up gauge",
+        ]
+        with self._lock:
+            hosts = sorted(self.windows)
+            for host in hosts:
+                if host in self.last_up:
+                    lines.append(f'kube_lab_probe_up{{host="{host}"}} {int(self.last_up[host])}')
+
+            lines += [
+                "# HELP kube_lab_probe_duration_seconds Probe latency over the last window of probes",
+                "# TYPE kube_lab_probe_duration_seconds summary",
+            ]
+            for host in hosts:
+                window = self.windows[host]
+                for q, value in window.quantiles(1).items():
+                    lines.append(f'kube_lab_probe_duration_seconds{{host="{host}",quantile="{q}"}} {value:.6f}')
+                lines.append(f'kube_lab_probe_duration_seconds_sum{{host="{host}"}} {window.total_sum:.6f}')
+                lines.append(f'kube_lab_probe_duration_seconds_count{{host="{host}"}} {sum(window.count.values())}')
+
+            lines += [
+                "# HELP kube_lab_probe_ttfb_seconds Time to first byte over the last window of probes",
+                "# TYPE kube_lab_probe_ttfb_seconds summary",
+            ]
+            for host in hosts:
+                window = self.windows[host]
+                for q, value in window.quantiles(2).items():
+                    lines.append(f'kube_lab_probe_ttfb_seconds{{host="{host}",quantile="{q}"}} {value:.6f}')
+                lines.append(f'kube_lab_probe_ttfb_seconds_sum{{host="{host}"}} {window.ttfb_sum:.6f}')
+                lines.append(f'kube_lab_probe_ttfb_seconds_count{{host="{host}"}} {sum(window.count.values())}')
+
+            lines += [
+                "# HELP kube_lab_probes_total Probes run, by result",
+                "# TYPE kube_lab_probes_total counter",
+            ]
+            for host in hosts:
+                for ok, count in self.windows[host].count.items():
+                    lines.append(f'kube_lab_probes_total{{host="{host}",result="{"success" if ok else "failure"}"}} {count}')
+
+            lines += [
+                "# HELP kube_lab_probe_success_ratio Share of successful probes over the last window",
+                "# TYPE kube_lab_probe_success_ratio gauge",
+            ]
+            for host in hosts:
+                lines.append(f'kube_lab_probe_success_ratio{{host="{host}"}} {self.windows[host].success_ratio():.6f}')
+
+            lines += [
+                "# HELP kube_lab_probe_hosts Ingress hosts currently probed",
+                "# TYPE kube_lab_probe_hosts gauge",
+                f"kube_lab_probe_hosts {len(hosts)}",
+                "# HELP kube_lab_probe_last_run_timestamp_seconds When the last probe round finished",
+                "# TYPE kube_lab_probe_last_run_timestamp_seconds gauge",
+                f"kube_lab_probe_last_run_timestamp_seconds {self.last_run:.3f}",
+                "# HELP kube_lab_probe_discovery_errors_total Failed Ingress discoveries",
+                "# TYPE kube_lab_probe_discovery_errors_total counter",
+                f"kube_lab_probe_discovery_errors_total {self.discovery_errors}",
+            ]
+        return "\n".join(lines) + "\n"
+
+def serve_metrics(daemon, port):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = daemon.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_daemon(args):
+    daemon = ProbeDaemon(
+        address=args.address, port=args.port, concurrency=args.concurrency, timeout=args.timeout,
+        interval=args.interval, rediscover=args.rediscover, window=args.window,
+    )
+    serve_metrics(daemon, args.listen)
+    print(f"📡 Probing Ingress hosts every {args.interval:g}s; metrics on :{args.listen}/metrics")
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
     try:
-        ingress_ip = get_ingress_ip()
-        result = subprocess.run(
-            ["curl", "-s", "-L", "-o", "/dev/null", "-w", "%{http_code}", "-H", f"Host: {host}", f"http://{ingress_ip}"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-        status_code = result.stdout.strip()
-        if status_code == "200":
-            print(f"✅ {host} is accessible")
-            return True
-        else:
-            print(f"❌ {host} returned status code {status_code}")
-            return False
-    except subprocess.TimeoutExpired:
-        print(f"❌ {host} timed out")
-        return False
-    except Exception as e:
-        print(f"❌ {host} failed: {e}")
-        return False
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that every Ingress host answers 200.")
+    parser.add_argument("--concurrency", type=int, default=16, help="parallel connections to the ingress")
+    parser.add_argument("--timeout", type=float, default=5, help="per-request timeout in seconds")
+    parser.add_argument("--address", help="ingress address to use instead of the one in the Ingress status")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--report", default="url_report.json", help="JSON report path ('' to skip)")
+    parser.add_argument("--daemon", action="store_true", help="keep probing and serve Prometheus metrics")
+    parser.add_argument("--interval", type=float, default=15, help="daemon: seconds between probe rounds")
+    parser.add_argument("--rediscover", type=float, default=60, help="daemon: seconds between Ingress lookups")
+    parser.add_argument("--window", type=int, default=240, help="daemon: probes per host kept for percentiles")
+    parser.add_argument("--listen", type=int, default=9115, help="daemon: metrics port")
+    args = parser.parse_args(argv)
+
+    if args.daemon:
+        run_daemon(args)
 
-def main():
     print("🔍 Fetching Ingress hostnames...\n")
-    hosts = get_ingress_hosts()
+    ingresses = get_ingresses()
+    hosts = ingress_hosts(ingresses)
 
     if not hosts:
         print("⚠️ No ingress hosts found.")
         sys.exit(0)
 
-    print("🧪 Curl-checking discovered Ingress URLs:\n")
-    failed = False
-    for host in hosts:
-        if not check_url(host):
-            failed = True
+    address = args.address or ingress_ip(ingresses)
+    print(f"🧪 Checking {len(hosts)} Ingress URL(s) via {address} ({args.concurrency} at a time):\n")
+    lock = threading.Lock()
+
+    def on_result(result):
+        with lock:
+            report_result(result)
+
+    start = time.perf_counter()
+    results = probe_all(hosts, address, args.concurrency, args.timeout, args.port, on_result)
+    elapsed = time.perf_counter() - start
+    if args.report:
+        write_report(args.report, address, results, elapsed)
+        print(f"\n📄 Report written to {args.report}")
 
-    if failed:
-        print("\n❌ One or more endpoints failed.")
+    if any(not r["ok"] for r in results):
+        print(f"\n❌ One or more endpoints failed. ({elapsed:.1f}s)")
         sys.exit(1)
 
-    print("\n✅ All endpoints are accessible.")
+    print(f"\n✅ All endpoints are accessible. ({elapsed:.1f}s)")
     sys.exit(0)
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+"""Shared Kubernetes access for the check scripts.
+
+Every check used to fork its own `kubectl get ... -o json`, some of them once
+per host. KubeClient lists through the Python kubernetes client when it is
+installed (one process, one connection pool) and falls back to kubectl
+otherwise. Both return the same plain dicts as `kubectl -o json`.
+
+Listings are cached for `ttl` seconds. After that the next list is
+resourceVersion-aware: it asks for a state not older than the one cached,
+which the API server answers from its watch cache instead of a quorum read,
+and if the collection's resourceVersion has not moved the cached items are
+kept as they are.
+"""
+import subprocess
+import threading
+import time
+import json
+import functools
+
+print = functools.partial(print, flush=True)
+
+# resource -> (API class, list-all-namespaces method, kubectl resource name)
+RESOURCES = {
+    "pods": ("CoreV1Api", "list_pod_for_all_namespaces", "pods"),
+    "services": ("CoreV1Api", "list_service_for_all_namespaces", "services"),
+    "nodes": ("CoreV1Api", "list_node", "nodes"),
+    "ingresses": ("NetworkingV1Api", "list_ingress_for_all_namespaces", "ingress"),
+}
+
+def load_api():
+    """The kubernetes package with its config loaded, or None if it isn't installed."""
+    try:
+        import kubernetes
+    except ImportError:
+        return None
+    try:
+        kubernetes.config.load_kube_config()
+    except Exception:
+        kubernetes.config.load_incluster_config()
+    return kubernetes
+
+class Listing:
+    def __init__(self, items, resource_version, fetched_at):
+        self.items = items
+        self.resource_version = resource_version
+        self.fetched_at = fetched_at
+
+class KubeClient:
+    def __init__(self, ttl=5, use_api=True, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.kubernetes = None
+        if use_api:
+            try:
+                self.kubernetes = load_api()
+            except Exception as e:
+                print(f"[WARN] Kubernetes API client unusable, using kubectl: {e}")
+        self.backend = "api" if self.kubernetes else "kubectl"
+        self._apis = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._resource_locks = {}
+        self.stats = {"hits": 0, "lists": 0, "unchanged": 0}
+
+    def list(self, resource, max_age=None):
+        """Items of `resource` across all namespaces, at most `max_age` (default ttl) seconds old."""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            resource_lock = self._resource_locks.setdefault(resource, threading.Lock())
+        # Concurrent callers of one resource share a single fetch; other
+        # resources don't wait for it
+        with resource_lock:
+            with self._lock:
+                cached = self._cache.get(resource)
+                if cached is not None and self.clock() - cached.fetched_at < max_age:
+                    self.stats["hits"] += 1
+                    return cached.items
+                self.stats["lists"] += 1
+
+            items, resource_version = self._fetch(resource, cached.resource_version if cached else None)
+            with self._lock:
+                if cached is not None and resource_version and resource_version == cached.resource_version:
+                    self.stats["unchanged"] += 1
+                    items = cached.items
+                self._cache[resource] = Listing(items, resource_version, self.clock())
+            return items
+
+    def invalidate(self, resource=None):
+        with self._lock:
+            if resource is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(resource, None)
+
+    def _fetch(self, resource, resource_version):
+        api_class, method, kubectl_name = RESOURCES[resource]
+        if self.backend == "api":
+            api = self._apis.get(api_class)
+            if api is None:
+                api = self._apis[api_class] = getattr(self.kubernetes.client, api_class)()
+            kwargs = {}
+            if resource_version:
+                kwargs = {"resource_version": resource_version, "resource_version_match": "NotOlderThan"}
+            listing = getattr(api, method)(**kwargs)
+            rv = listing.metadata.resource_version
+            if resource_version and rv == resource_version:
+                return None, rv  # caller keeps its items; skip the conversion
+            to_dict = api.api_client.sanitize_for_serialization
+            return [to_dict(item) for item in listing.items], rv
+
+        cmd = ["kubectl", "get", kubectl_name, "-o", "json"]
+        if resource != "nodes":
+            cmd.insert(3, "-A")
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        if result.returncode != 0:
+            raise RuntimeError(f"kubectl get {kubectl_name} failed: {result.stderr.strip()}")
+        data = json.loads(result.stdout)
+        return data.get("items", []), data.get("metadata", {}).get("resourceVersion")
+
+    def secret_data(self, namespace, name):
+        """A Secret's base64-encoded data (never cached)."""
+        if self.backend == "api":
+            secret = self.kubernetes.client.CoreV1Api().read_namespaced_secret(name=name, namespace=namespace)
+            return dict(secret.data or {})
+        result = subprocess.run(
+            ["kubectl", "-n", namespace, "get", "secret", name, "-o", "json"],
+            capture_output=True, text=True, timeout=10,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"kubectl get secret {name} failed: {result.stderr.strip()}")
+        return json.loads(result.stdout).get("data") or {}
+
+    # -- helpers shared by the checks -----------------------------------------
+
+    def ingresses(self, max_age=None):
+        return self.list("ingresses", max_age)
+
+    def pods(self, max_age=None):
+        return self.list("pods", max_age)
+
+    def ingress_hosts(self, max_age=None):
+        return ingress_hosts(self.ingresses(max_age))
+
+    def ingress_ip(self, max_age=None):
+        try:
+            ingresses = self.ingresses(max_age)
+        except Exception as e:
+            print(f"[ERROR] Failed to extract Ingress IP: {e}")
+            ingresses = []
+        return ingress_ip(ingresses)
+
+def ingress_hosts(ingresses):
+    hosts = set()
+    for item in ingresses:
+        for rule in item.get("spec", {}).get("rules") or []:
+            host = rule.get("host")
+            if host:
+                hosts.add(host)
+    return sorted(hosts)
+
+def ingress_ip(ingresses, quiet=False):
+    for item in ingresses:
+        addresses = (item.get("status", {}).get("loadBalancer") or {}).get("ingress") or []
+        if addresses:
+            ip = addresses[0].get("ip") or addresses[0].get("hostname")
+            if ip:
+                return ip
+    # Fallback to localhost if nothing is found
+    if not quiet:
+        print("[WARN] Falling back to 127.0.0.1 as Ingress IP.")
+    return "127.0.0.1"
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The process-wide KubeClient, so every check in one run shares its cache."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = KubeClient()
+        return _client
@@ -0,0 +1,291 @@
+"""Post-provision verification: every check, as a dependency graph.
+
+Each check starts as soon as the checks it depends on have passed, so the
+run takes as long as its slowest chain instead of the sum of all checks:
+
+    pods ──> urls
+    prometheus          (waits with its own backoff, no need to gate it)
+    token
+
+Output lines are prefixed with the check that printed them and streamed as
+they come. A JSON and/or JUnit report with per-check timings is written at
+the end.
+"""
+import sys
+import json
+import time
+import base64
+import argparse
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from xml.etree import ElementTree
+
+import check_health
+import check_prometheus
+import check_urls
+from kube_common import get_client
+
+print = functools.partial(print, flush=True)
+
+class CheckFailed(Exception):
+    pass
+
+class Check:
+    def __init__(self, name, fn, deps=(), description=""):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.description = description
+        # Filled in by the run
+        self.status = "pending"  # passed / failed / skipped
+        self.message = ""
+        self.details = None
+        self.started = None
+        self.duration = 0.0
+        self.output = []
+
+# ─────────────────────────────────────────────
+# The checks. Each returns details for the report or raises CheckFailed.
+
+def check_pods(args):
+    try:
+        ready, pods = check_health.wait_for_pods_ready(args.pod_timeout)
+    except check_health.PodWatchError as e:
+        raise CheckFailed(str(e))
+    if not ready:
+        unready = sorted(f"{ns}/{name}" for (ns, name), pod in pods.items() if not check_health.is_pod_ready(pod))
+        raise CheckFailed(f"{len(unready)} pod(s) not Ready: {', '.join(unready)}")
+    check_health.print_time_to_ready(pods)
+    return {"pods": len(pods)}
+
+def check_prometheus_jobs(args):
+    prometheus = check_prometheus.PrometheusQuery(args.address or get_client().ingress_ip(), port=args.port)
+    try:
+        healthy, results = check_prometheus.wait_for_jobs(prometheus, timeout=args.prometheus_timeout)
+    finally:
+        prometheus.close()
+    check_prometheus.print_results(results)
+    if not healthy:
+        missing = [r["job"] for r in results if r["expected"] and not r["healthy"]] or ["<no answer>"]
+        raise CheckFailed(f"Prometheus jobs not up: {', '.join(missing)}")
+    return {"jobs": results}
+
+def check_ingress_urls(args):
+    hosts = get_client().ingress_hosts()
+    if not hosts:
+        raise CheckFailed("no ingress hosts found")
+    results = check_urls.probe_all(hosts, args.address or get_client().ingress_ip(), concurrency=args.concurrency, port=args.port)
+    for result in results:
+        check_urls.report_result(result)
+    failed = [r["host"] for r in results if not r["ok"]]
+    if failed:
+        raise CheckFailed(f"{len(failed)}/{len(hosts)} host(s) failed: {', '.join(failed)}")
+    return {"hosts": results}
+
+def check_dashboard_token(args):
+    data = get_client().secret_data("kubernetes-dashboard", "static-admin-user-token")
+    token = base64.b64decode(data.get("token") or "").decode()
+    if not token:
+        raise CheckFailed("static-admin-user-token has no token yet")
+    if args.token_file:
+        with open(args.token_file, "w") as f:
+            f.write(token)
+        print(f"[OK] Saved K8s Dashboard token to {args.token_file}")
+    return {"token_length": len(token)}
+
+CHECKS = (
+    ("pods", check_pods, (), "Every important pod is Ready"),
+    ("prometheus", check_prometheus_jobs, (), "Every ServiceMonitor job has all targets up"),
+    ("urls", check_ingress_urls, ("pods",), "Every Ingress host answers 200"),
+    ("token", check_dashboard_token, (), "The K8s Dashboard token secret is populated"),
+)
+
+# ─────────────────────────────────────────────
+
+class PrefixedOutput:
+    """Stands in for sys.stdout: lines printed by a check's thread get its name in front."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def bind(self, check):
+        self.local.check = check
+        self.local.partial = ""
+
+    def write(self, text):
+        check = getattr(self.local, "check", None)
+        if check is None:
+            with self.lock:
+                return self.stream.write(text)
+        lines = (self.local.partial + text).split("\n")
+        self.local.partial = lines.pop()
+        with self.lock:
+            for line in lines:
+                check.output.append(line)
+                self.stream.write(f"[{check.name}] {line}\n" if line.strip() else "\n")
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def run_checks(checks, args, workers=None):
+    """Run `checks` (a list of Check) as a DAG; returns them with their results filled in."""
+    by_name = {c.name: c for c in checks}
+    for check in checks:
+        unknown = [d for d in check.deps if d not in by_name]
+        if unknown:
+            raise ValueError(f"{check.name} depends on unknown check(s): {', '.join(unknown)}")
+
+    output = PrefixedOutput(sys.stdout)
+    run_started = time.monotonic()
+
+    def run(check):
+        output.bind(check)
+        check.started = time.monotonic() - run_started
+        try:
+            check.details = check.fn(args)
+            check.status = "passed"
+        except CheckFailed as e:
+            check.status, check.message = "failed", str(e)
+        except Exception as e:
+            check.status, check.message = "failed", f"{type(e).__name__}: {e}"
+        check.duration = time.monotonic() - run_started - check.started
+        output.bind(None)
+        return check
+
+    reported = set()
+
+    def report(check):
+        reported.add(check.name)
+        icon = {"passed": "[OK] ✅", "failed": "[ERROR] ❌", "skipped": "[WARN] ⏭️"}[check.status]
+        note = f": {check.message}" if check.message else ""
+        print(f"{icon} {check.name} {check.status} in {check.duration:.1f}s{note}")
+
+    stdout, sys.stdout = sys.stdout, output
+    try:
+        with ThreadPoolExecutor(max_workers=workers or len(checks)) as pool:
+            running = {}
+            while True:
+                changed = True
+                while changed:  # a skip can make further checks skippable
+                    changed = False
+                    for check in checks:
+                        if check.name in reported or check in running.values():
+                            continue
+                        # Only go by reported deps: a worker sets its status before
+                        # the loop reports it, and a skip must not print first
+                        deps = [by_name[d] for d in check.deps]
+                        failed = [d.name for d in deps if d.name in reported and d.status != "passed"]
+                        if failed:
+                            check.status = "skipped"
+                            check.message = f"needs {', '.join(failed)}"
+                            report(check)
+                            changed = True
+                        elif all(d.name in reported for d in deps):
+                            running[pool.submit(run, check)] = check
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    report(running.pop(future))
+            for check in checks:
+                if check.status == "pending":
+                    check.status, check.message = "skipped", "dependency cycle"
+                    report(check)
+    finally:
+        sys.stdout = stdout
+    return checks, time.monotonic() - run_started
+
+# ─────────────────────────────────────────────
+
+def write_json(path, checks, elapsed):
+    report = {
+        "elapsed_seconds": round(elapsed, 3),
+        "sum_of_checks_seconds": round(sum(c.duration for c in checks), 3),
+        "passed": all(c.status == "passed" for c in checks),
+        "checks": [{
+            "name": c.name,
+            "description": c.description,
+            "depends_on": list(c.deps),
+            "status": c.status,
+            "message": c.message,
+            "started_seconds": round(c.started, 3) if c.started is not None else None,
+            "duration_seconds": round(c.duration, 3),
+            "details": c.details,
+        } for c in checks],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+def write_junit(path, checks, elapsed):
+    suite = ElementTree.Element("testsuite", {
+        "name": "kube-lab-verify",
+        "tests": str(len(checks)),
+        "failures": str(sum(c.status == "failed" for c in checks)),
+        "skipped": str(sum(c.status == "skipped" for c in checks)),
+        "time": f"{elapsed:.3f}",
+    })
+    for c in checks:
+        case = ElementTree.SubElement(suite, "testcase", {"classname": "verify", "name": c.name, "time": f"{c.duration:.3f}"})
+        if c.status == "failed":
+            ElementTree.SubElement(case, "failure", {"message": c.message}).text = c.message
+        elif c.status == "skipped":
+            ElementTree.SubElement(case, "skipped", {"message": c.message})
+        ElementTree.SubElement(case, "system-out").text = "\n".join(c.output)
+    ElementTree.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify a provisioned lab: pods, Prometheus, Ingress URLs, dashboard token.")
+    parser.add_argument("--only", help="comma-separated checks to run (their dependencies are added)")
+    parser.add_argument("--optional", default="", help="comma-separated checks whose failure doesn't fail the run")
+    parser.add_argument("--json", help="write a JSON timing report to this path")
+    parser.add_argument("--junit", help="write a JUnit XML report to this path")
+    parser.add_argument("--address", help="ingress address to use instead of the one in the Ingress status")
+    parser.add_argument("--port", type=int, default=80, help="ingress HTTP port")
+    parser.add_argument("--pod-timeout", type=float, default=300)
+    parser.add_argument("--prometheus-timeout", type=float, default=120)
+    parser.add_argument("--concurrency", type=int, default=16, help="parallel URL probes")
+    parser.add_argument("--token-file", help="also save the dashboard token to this path")
+    args = parser.parse_args(argv)
+
+    checks = [Check(*spec) for spec in CHECKS]
+    if args.only:
+        by_name = {c.name: c for c in checks}
+        wanted = set()
+        todo = [n.strip() for n in args.only.split(",") if n.strip()]
+        while todo:
+            name = todo.pop()
+            if name not in by_name:
+                parser.error(f"unknown check: {name}")
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(by_name[name].deps)
+        checks = [c for c in checks if c.name in wanted]
+    optional = {n.strip() for n in args.optional.split(",") if n.strip()}
+
+    print(f"🔍 Verifying the lab: {', '.join(c.name for c in checks)}\n")
+    checks, elapsed = run_checks(checks, args)
+
+    if args.json:
+        write_json(args.json, checks, elapsed)
+    if args.junit:
+        write_junit(args.junit, checks, elapsed)
+
+    print("\n📋 Verification summary:")
+    for c in checks:
+        icon = {"passed": "✅", "failed": "❌", "skipped": "⏭️"}[c.status]
+        extra = " (optional)" if c.name in optional and c.status != "passed" else ""
+        print(f"  {icon} {c.name:<12} {c.status:<8} {c.duration:6.1f}s{extra}")
+    print(f"\n⏱️ {elapsed:.1f}s wall time for {sum(c.duration for c in checks):.1f}s of checks")
+
+    if any(c.status != "passed" and c.name not in optional for c in checks):
+        print("❌ Verification failed.")
+        return 1
+    print("✅ Lab verified.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())